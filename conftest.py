@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_files(django_test_environment):
+    """Кэш, медиа, логи и метрики тестов — во временном каталоге."""
+    from core.testing import IsolatedFiles
+
+    with IsolatedFiles():
+        yield
@@ -0,0 +1,290 @@
+"""Кэш в файле SQLite, общий для всех процессов одной машины.
+
+В отличие от ``LocMemCache`` запись видна всем WSGI-воркерам сразу,
+а в отличие от ``FileBasedCache`` поддерживает атомарный ``incr``,
+пакетные ``get_many``/``set_many`` и вытеснение давно не читанных
+записей по суммарному размеру.
+
+Настройки (``OPTIONS``):
+
+* ``MAX_BYTES`` — предел суммарного размера значений;
+* ``CULL_RATIO`` — до какой доли предела вытеснять при переполнении;
+* ``ACCESS_RESOLUTION`` — как часто (в секундах) обновлять время
+  последнего чтения записи: чтение без записи в файл дешевле, а LRU
+  остаётся приблизительным с этой точностью;
+* ``BUSY_TIMEOUT`` — сколько секунд ждать блокировку файла.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics, timing
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_size ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' total INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_size VALUES (0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_size SET total = total + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_size SET total = total - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_size_update '
+    'AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_size SET total = total + new.size - old.size; END',
+)
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+    'expires = excluded.expires, accessed = excluded.accessed, '
+    'size = excluded.size'
+)
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 500
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._cull_ratio = float(options.get('CULL_RATIO', 0.9))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with _transaction(connection):
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _row(self, key, value, timeout, now):
+        data = self._dumps(value)
+        return key, data, self.get_backend_timeout(timeout), now, len(data)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _family(self, key):
+        # make_key() даёт «<KEY_PREFIX>:<версия>:<ключ>».
+        key = key[len(self.key_prefix) + 1:].split(':', 1)[-1]
+        return metrics.key_family(key)
+
+    def _is_alive(self, expires, now):
+        return expires is None or expires > now
+
+    def _touch_rows(self, keys, now):
+        for chunk in _chunks(keys):
+            self._connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)),
+                [now, *chunk],
+            )
+
+    def _select(self, keys):
+        started = time.perf_counter()
+        now = time.time()
+        found, stale = {}, []
+        for chunk in _chunks(keys):
+            rows = self._connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN (%s)' % ', '.join('?' * len(chunk)),
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if not self._is_alive(expires, now):
+                    continue
+                found[key] = pickle.loads(value)
+                if now - accessed >= self._access_resolution:
+                    stale.append(key)
+        if stale:
+            self._touch_rows(stale, now)
+        timing.record_cache(
+            len(found), len(keys) - len(found),
+            time.perf_counter() - started,
+        )
+        metrics.record_cache(
+            {key: self._family(key) for key in keys}, found
+        )
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._select([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._key(key, version): key for key in keys}
+        found = self._select(list(keys_map))
+        return {keys_map[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection.execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and self._is_alive(row[0], time.time())
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with _transaction(self._connection) as connection:
+            connection.execute(UPSERT, self._row(key, value, timeout,
+                                                 time.time()))
+            self._cull(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        with _transaction(self._connection) as connection:
+            connection.executemany(UPSERT, rows)
+            self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with _transaction(self._connection) as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self._is_alive(row[0], now):
+                return False
+            connection.execute(UPSERT, self._row(key, value, timeout, now))
+            self._cull(connection)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with _transaction(self._connection) as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._is_alive(row[1], now):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = self._dumps(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ?, size = ? '
+                'WHERE key = ?',
+                (data, now, len(data), key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with _transaction(self._connection) as connection:
+            for chunk in _chunks(keys):
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (%s)'
+                    % ', '.join('?' * len(chunk)),
+                    chunk,
+                )
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами потока.
+        pass
+
+    def _total(self, connection):
+        return connection.execute(
+            'SELECT total FROM cache_size'
+        ).fetchone()[0]
+
+    def _cull(self, connection):
+        total = self._total(connection)
+        if total <= self._max_bytes:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        excess = self._total(connection) - self._max_bytes * self._cull_ratio
+        victims = []
+        rows = connection.execute(
+            'SELECT key, size FROM cache ORDER BY accessed'
+        )
+        for key, size in rows:
+            if excess <= 0:
+                break
+            victims.append(key)
+            excess -= size
+        for chunk in _chunks(victims):
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)),
+                chunk,
+            )
+
+
+class _transaction:
+    """``BEGIN IMMEDIATE`` сразу берёт блокировку записи."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
+
+
+def _chunks(items):
+    for start in range(0, len(items), MAX_VARIABLES):
+        yield items[start:start + MAX_VARIABLES]
@@ -0,0 +1,120 @@
+"""SQLite для нескольких WSGI-воркеров.
+
+Отличия от ``django.db.backends.sqlite3``:
+
+* при подключении выполняются ``PRAGMA`` из ``DEFAULT_PRAGMAS`` и
+  ``OPTIONS['PRAGMAS']`` (значение ``None`` отменяет настройку по
+  умолчанию): WAL — читатели не ждут писателя, а писатель
+  читателей; ``busy_timeout`` — сколько ждать блокировку файла;
+* ``atomic()`` открывает транзакцию ``BEGIN IMMEDIATE``: блокировка записи
+  берётся в начале, а не на первом изменении. Отложенная транзакция,
+  прочитавшая данные до чужой записи, получает «database is locked» сразу,
+  без ожидания ``busy_timeout``;
+* ``PRAGMAS['foreign_keys'] = 'off'`` выключает внешние ключи насовсем:
+  миграции не включают их обратно и не проверяют (нужно шардам
+  ``posts.sharding``, где нет строк пользователей и групп);
+* транзакции одного процесса ждут друг друга на ``threading.Lock`` и не
+  крутятся в цикле ожидания SQLite. Отключается
+  ``OPTIONS['WRITE_LOCK'] = False``.
+"""
+import threading
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    # С WAL изменения не теряются при падении процесса, только при
+    # отключении питания.
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # Отрицательное значение — в КиБ: 20 МБ страниц на соединение.
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+OPTIONS = ('PRAGMAS', 'WRITE_LOCK')
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(name):
+    with _write_locks_guard:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('PRAGMAS', {})}
+        self.write_lock = (
+            _write_lock(self.settings_dict['NAME'])
+            if options.get('WRITE_LOCK', True) else None
+        )
+        self._holds_write_lock = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for option in OPTIONS:
+            kwargs.pop(option, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is None:
+                continue
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _checks_foreign_keys(self):
+        return self.pragmas.get('foreign_keys') != 'off'
+
+    def enable_constraint_checking(self):
+        if self._checks_foreign_keys():
+            super().enable_constraint_checking()
+
+    def check_constraints(self, table_names=None):
+        if self._checks_foreign_keys():
+            super().check_constraints(table_names)
+
+    def _start_transaction_under_autocommit(self):
+        self._acquire_write_lock()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except BaseException:
+            self._release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            self._release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_write_lock()
+
+    def _acquire_write_lock(self):
+        if self.write_lock is None:
+            return
+        timeout = self.pragmas['busy_timeout'] / 1000
+        if not self.write_lock.acquire(timeout=timeout):
+            raise OperationalError('database is locked')
+        self._holds_write_lock = True
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            self.write_lock.release()
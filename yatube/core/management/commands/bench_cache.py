@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+BATCH = 10
+
+
+def _set(cache, keys, value):
+    for key in keys:
+        cache.set(key, value)
+
+
+def _get(cache, keys, value):
+    for key in keys:
+        cache.get(key)
+
+
+def _get_many(cache, keys, value):
+    for start in range(0, len(keys), BATCH):
+        cache.get_many(keys[start:start + BATCH])
+
+
+def _set_many(cache, keys, value):
+    for start in range(0, len(keys), BATCH):
+        cache.set_many({key: value for key in keys[start:start + BATCH]})
+
+
+def _incr(cache, keys, value):
+    cache.set('counter', 0)
+    for _ in keys:
+        cache.incr('counter')
+
+
+OPERATIONS = {
+    'set': _set,
+    'get': _get,
+    'get_many': _get_many,
+    'set_many': _set_many,
+    'incr': _incr,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLiteCache с LocMemCache и FileBasedCache: '
+        'число операций в секунду для set, get, get_many, set_many и incr.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--value-size', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            backends = {
+                'locmem': LocMemCache('bench', {}),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'), {}
+                ),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), {}
+                ),
+            }
+            keys = [f'bench:{i}' for i in range(options['keys'])]
+            value = 'x' * options['value_size']
+            header = f'{"":<10}' + ''.join(
+                f'{name:>12}' for name in OPERATIONS
+            )
+            self.stdout.write(header + '   (операций в секунду)')
+            for name, cache in backends.items():
+                cache.clear()
+                line = f'{name:<10}'
+                for operation in OPERATIONS.values():
+                    started = time.perf_counter()
+                    operation(cache, keys, value)
+                    elapsed = time.perf_counter() - started
+                    line += f'{len(keys) / elapsed:>12.0f}'
+                self.stdout.write(line)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
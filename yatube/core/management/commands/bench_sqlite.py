@@ -0,0 +1,246 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+ALIAS = 'bench_sqlite'
+ENGINES = {
+    'django': 'django.db.backends.sqlite3',
+    'tuned': 'core.db_backends.sqlite3',
+}
+POSTS = 1000
+AUTHORS = 100
+FEED_SIZE = 10
+SCHEMA = (
+    'CREATE TABLE bench_post (id INTEGER PRIMARY KEY, '
+    'author_id INTEGER NOT NULL, created INTEGER NOT NULL, '
+    'text TEXT NOT NULL, comments INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX bench_post_created ON bench_post (created)',
+    'CREATE TABLE bench_comment (id INTEGER PRIMARY KEY, '
+    'post_id INTEGER NOT NULL, text TEXT NOT NULL)',
+    'CREATE INDEX bench_comment_post ON bench_comment (post_id)',
+)
+
+
+def shard_alias(shard):
+    return f'{ALIAS}_{shard}'
+
+
+def use_database(engine, paths):
+    for shard, path in enumerate(paths):
+        connections.databases[shard_alias(shard)] = {
+            'ENGINE': engine, 'NAME': path,
+        }
+
+
+def author_of(post_id):
+    return (post_id - 1) % AUTHORS
+
+
+def shard_of(author_id, shards):
+    """Шард автора: посты и комментарии к ним лежат в одном файле."""
+    return author_id % shards
+
+
+def read(cursors, rng):
+    # Как index: по FEED_SIZE свежих постов из каждого шарда сливаются
+    # по дате, затем для каждого поста считаются комментарии в его шарде.
+    before = rng.randint(FEED_SIZE, POSTS)
+    feeds = []
+    for cursor in cursors:
+        cursor.execute(
+            'SELECT created, id, author_id FROM bench_post '
+            'WHERE created <= %s ORDER BY created DESC LIMIT %s',
+            [before, FEED_SIZE],
+        )
+        feeds.append(cursor.fetchall())
+    feed = heapq.merge(*feeds, reverse=True)
+    for _, post_id, author_id in itertools.islice(feed, FEED_SIZE):
+        cursors[shard_of(author_id, len(cursors))].execute(
+            'SELECT COUNT(*) FROM bench_comment WHERE post_id = %s',
+            [post_id],
+        )
+
+
+def write(cursor, post_id):
+    # Как add_comment: прочитать пост, добавить комментарий и обновить
+    # счётчик в одной транзакции.
+    cursor.execute('SELECT comments FROM bench_post WHERE id = %s', [post_id])
+    cursor.fetchone()
+    cursor.execute(
+        'INSERT INTO bench_comment (post_id, text) VALUES (%s, %s)',
+        [post_id, 'комментарий'],
+    )
+    cursor.execute(
+        'UPDATE bench_post SET comments = comments + 1 WHERE id = %s',
+        [post_id],
+    )
+
+
+def run_thread(shards, deadline, write_ratio, seed, totals, lock):
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    aliases = [shard_alias(shard) for shard in range(shards)]
+    try:
+        while time.monotonic() < deadline:
+            try:
+                if rng.random() < write_ratio:
+                    post_id = rng.randint(1, POSTS)
+                    alias = aliases[shard_of(author_of(post_id), shards)]
+                    with transaction.atomic(using=alias):
+                        write(connections[alias].cursor(), post_id)
+                    writes += 1
+                else:
+                    read(
+                        [connections[alias].cursor() for alias in aliases],
+                        rng,
+                    )
+                    reads += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        for alias in aliases:
+            connections[alias].close()
+    with lock:
+        totals['reads'] += reads
+        totals['writes'] += writes
+        totals['errors'] += errors
+
+
+def run_worker(engine, paths, seconds, write_ratio, threads, seed, queue):
+    """Процесс-воркер: ``threads`` потоков читают и пишут ``seconds`` с."""
+    use_database(engine, paths)
+    deadline = time.monotonic() + seconds
+    totals = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    workers = [
+        threading.Thread(target=run_thread, args=(
+            len(paths), deadline, write_ratio, seed * 1000 + number,
+            totals, lock,
+        ))
+        for number in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    queue.put(totals)
+
+
+class Command(BaseCommand):
+    help = (
+        'Чтения и записи в секунду в SQLite при нескольких воркерах: '
+        'стандартный бэкенд Django против core.db_backends.sqlite3, '
+        'одна база против постов, разложенных по авторам в несколько '
+        'файлов. Каждый замер — на отдельных временных базах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 4, 8],
+            help='Числа процессов-воркеров для замеров.',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Потоков в каждом процессе.',
+        )
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность одного замера.',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля записей среди операций.',
+        )
+        parser.add_argument(
+            '--engines', nargs='+', choices=ENGINES, default=list(ENGINES),
+        )
+        parser.add_argument(
+            '--shards', type=int, nargs='+', default=[1],
+            help='Числа файлов, по которым раскладываются посты авторов.',
+        )
+
+    def handle(self, *args, **options):
+        # Воркерам нужны уже настроенные приложения Django.
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"бэкенд":<8}{"воркеры":>9}{"шарды":>7}{"чтений/с":>11}'
+            f'{"записей/с":>11}{"ошибок":>8}'
+        )
+        try:
+            for workers in options['workers']:
+                for name in options['engines']:
+                    for shards in options['shards']:
+                        self.report(context, name, workers, shards, options)
+        finally:
+            for shard in range(max(options['shards'])):
+                connections.databases.pop(shard_alias(shard), None)
+
+    def report(self, context, name, workers, shards, options):
+        directory = tempfile.mkdtemp()
+        try:
+            totals = self.measure(
+                context, ENGINES[name],
+                [
+                    os.path.join(directory, f'bench{shard}.sqlite3')
+                    for shard in range(shards)
+                ],
+                workers, options,
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        seconds = options['seconds']
+        self.stdout.write(
+            f'{name:<8}{workers:>9}{shards:>7}'
+            f'{totals["reads"] / seconds:>11.0f}'
+            f'{totals["writes"] / seconds:>11.0f}'
+            f'{totals["errors"]:>8}'
+        )
+
+    def measure(self, context, engine, paths, workers, options):
+        use_database(engine, paths)
+        rows = [[] for _ in paths]
+        for post_id in range(1, POSTS + 1):
+            author_id = author_of(post_id)
+            rows[shard_of(author_id, len(paths))].append(
+                [post_id, author_id, post_id, f'пост {post_id}']
+            )
+        for shard, shard_rows in enumerate(rows):
+            alias = shard_alias(shard)
+            connection = connections[alias]
+            with transaction.atomic(using=alias):
+                with connection.cursor() as cursor:
+                    for statement in SCHEMA:
+                        cursor.execute(statement)
+                    cursor.executemany(
+                        'INSERT INTO bench_post (id, author_id, created, '
+                        'text) VALUES (%s, %s, %s, %s)',
+                        shard_rows,
+                    )
+            connection.close()
+            del connections[alias]
+        queue = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(
+                engine, paths, options['seconds'], options['write_ratio'],
+                options['threads'], number, queue,
+            ))
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return {
+            key: sum(result[key] for result in results)
+            for key in ('reads', 'writes', 'errors')
+        }
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slow_queries import offenders
+
+
+class Command(BaseCommand):
+    help = (
+        'Худшие медленные SQL-запросы из журнала по суммарному времени: '
+        'число, время, представления, шаблоны и план запроса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько отпечатков показать.',
+        )
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG_FILE,
+            help='Файл журнала медленных запросов.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['log'], encoding='utf-8') as log:
+                groups = offenders(log)
+        except FileNotFoundError:
+            raise CommandError(f'Журнал {options["log"]} не найден.')
+        if not groups:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        for group in groups[:options['top']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{group["fingerprint"]}: {group["count"]} раз, '
+                f'всего {group["total_ms"]:.1f} мс, '
+                f'максимум {group["max_ms"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {group["sql"]}')
+            for title, counts in (
+                ('представления', group['views']),
+                ('шаблоны', group['templates']),
+            ):
+                if counts:
+                    names = sorted(
+                        counts.items(), key=lambda item: item[1],
+                        reverse=True,
+                    )
+                    self.stdout.write(f'  {title}: ' + ', '.join(
+                        f'{name} ({count})' for name, count in names
+                    ))
+            for row in group['plan'] or ():
+                self.stdout.write(f'  план: {row}')
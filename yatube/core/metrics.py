@@ -0,0 +1,299 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Каждый процесс пишет значения в свой файл ``METRICS_DIR/<pid>.db``,
+отображённый в память: изменение метрики — запись восьми байт без
+системных вызовов и блокировок между процессами. Эндпоинт ``/metrics``
+читает файлы всех процессов и складывает значения, поэтому любой
+WSGI-воркер отдаёт сумму по всем.
+
+Файлы завершившихся процессов не удаляются, их счётчики остаются в
+сумме. Каталог очищается при деплое до запуска воркеров.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+INITIAL_SIZE = 64 * 1024
+# В начале файла — число занятых байт, за ним записи: длина ключа, ключ,
+# выравнивание до 8 байт и значение double.
+HEADER = struct.Struct('i4x')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, math.inf)
+FAMILY = re.compile(r'template\.cache\.[^.]+|[^:|]+(\|\|[^|]+)?')
+
+
+def _padding(length):
+    return -(LENGTH.size + length) % 8
+
+
+def read_values(data):
+    """Пары ``(ключ, значение, смещение значения)`` из файла метрик."""
+    used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        position += LENGTH.size
+        key = bytes(data[position:position + length]).decode()
+        position += length + _padding(length)
+        yield key, VALUE.unpack_from(data, position)[0], position
+        position += VALUE.size
+
+
+class MmapValues:
+    """Значения метрик одного процесса в файле, отображённом в память."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._mmap, 0)[0] or HEADER.size
+        HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions = {
+            key: position
+            for key, _, position in read_values(self._mmap)
+        }
+
+    def add(self, key, amount):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._append(key)
+            value = VALUE.unpack_from(self._mmap, position)[0]
+            VALUE.pack_into(self._mmap, position, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = len(encoded) + _padding(len(encoded))
+        size = LENGTH.size + padded + VALUE.size
+        while self._used + size > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        struct.pack_into(
+            f'i{padded}s', self._mmap, self._used, len(encoded), encoded
+        )
+        position = self._used + LENGTH.size + padded
+        VALUE.pack_into(self._mmap, position, 0.0)
+        # Запись становится видна читателям только после сдвига границы.
+        self._used += size
+        HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+_process = None
+_process_lock = threading.Lock()
+
+
+def _values():
+    # После fork у воркера свой pid и свой файл.
+    global _process
+    directory = settings.METRICS_DIR
+    pid = os.getpid()
+    with _process_lock:
+        if _process is None or _process[:2] != (pid, directory):
+            os.makedirs(directory, exist_ok=True)
+            _process = (pid, directory, MmapValues(
+                os.path.join(directory, f'{pid}.db')
+            ))
+        return _process[2]
+
+
+def collect():
+    """Сумма значений по файлам всех процессов."""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.db')):
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            continue
+        for key, value, _ in read_values(data):
+            totals[key] += value
+    return totals
+
+
+registry = []
+
+
+class Metric:
+    type = None
+    # Имя семейства в выдаче: у счётчиков с суффиксом, как и у значений.
+    suffix = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.append(self)
+
+    def _key(self, suffix, labels, *extra):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labelnames}'
+            )
+        return json.dumps(
+            [self.name + suffix, sorted(labels.items()), *extra],
+            ensure_ascii=False,
+        )
+
+    def samples(self, values):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+    suffix = '_total'
+
+    def inc(self, amount=1, **labels):
+        _values().add(self._key(self.suffix, labels), amount)
+
+    def totals(self):
+        """Суммы по всем процессам: ``{значения меток по labelnames: n}``."""
+        result = {}
+        for key, value in collect().items():
+            name, labels = json.loads(key)[:2]
+            if name == self.name + self.suffix:
+                labels = dict(labels)
+                result[tuple(
+                    labels[label] for label in self.labelnames
+                )] = value
+        return result
+
+    def samples(self, values):
+        for (name, labels), value in sorted(values.items()):
+            yield name, labels, value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        values = _values()
+        # В файле — попадания в каждый интервал, накопленные суммы
+        # считаются при выдаче.
+        le = next(le for le in self.buckets if value <= le)
+        values.add(self._key('_bucket', labels, le), 1)
+        values.add(self._key('_sum', labels), value)
+        values.add(self._key('_count', labels), 1)
+
+    def samples(self, values):
+        series = defaultdict(dict)
+        for (name, labels, *le), value in values.items():
+            series[labels][name, *le] = value
+        for labels, found in sorted(series.items()):
+            total = 0
+            for le in self.buckets:
+                total += found.get((self.name + '_bucket', le), 0)
+                yield (
+                    self.name + '_bucket',
+                    labels + (('le', _format_value(le)),),
+                    total,
+                )
+            yield self.name + '_sum', labels, found.get(
+                (self.name + '_sum',), 0
+            )
+            yield self.name + '_count', labels, found.get(
+                (self.name + '_count',), 0
+            )
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def exposition():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    by_metric = defaultdict(dict)
+    for key, value in collect().items():
+        name, labels, *le = json.loads(key)
+        base = name.rsplit('_', 1)[0]
+        labels = tuple(tuple(pair) for pair in labels)
+        by_metric[base][(name, labels, *le)] = value
+    lines = []
+    for metric in registry:
+        family = metric.name + metric.suffix
+        lines.append(f'# HELP {family} {metric.documentation}')
+        lines.append(f'# TYPE {family} {metric.type}')
+        for name, labels, value in metric.samples(by_metric[metric.name]):
+            if labels:
+                name += '{%s}' % ','.join(
+                    f'{label}="{_escape(text)}"' for label, text in labels
+                )
+            lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по именам маршрутов.',
+    ['view'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'yatube_request_db_queries',
+    'Запросов к базе на один HTTP-запрос.',
+    ['view'],
+    buckets=COUNT_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests',
+    'Чтения ключей кэша по семействам ключей.',
+    ['family', 'result'],
+)
+
+
+def key_family(key):
+    """Семейство ключа кэша: ``feedgen:index`` → ``feedgen``.
+
+    Для фрагментов шаблонов — имя фрагмента, для sorl-thumbnail —
+    тип записи (``sorl-thumbnail||image``).
+    """
+    match = FAMILY.match(key)
+    return match.group() if match else key
+
+
+def record_cache(keys, found):
+    """Попадания и промахи по семействам; ``keys`` — ``{ключ: семейство}``."""
+    counts = defaultdict(int)
+    for key, family in keys.items():
+        counts[family, 'hit' if key in found else 'miss'] += 1
+    for (family, result), count in counts.items():
+        CACHE_REQUESTS.inc(count, family=family, result=result)
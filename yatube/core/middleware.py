@@ -0,0 +1,108 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import metrics
+from .routers import Routing
+from .timing import RequestTiming, current
+
+logger = logging.getLogger('core.timing')
+
+
+def _url_name(request):
+    match = request.resolver_match
+    if match is None:
+        # Ответ из кэша страниц отдан до разрешения URL.
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.view_name
+
+
+class RequestTimingMiddleware:
+    """Время запроса по частям: база, кэш, шаблоны, представление.
+
+    Счётчики запроса доступны как ``request.timing``. Время ответа и
+    число запросов к базе каждого запроса попадают в метрики
+    ``core.metrics``. Для доли запросов ``REQUEST_TIMING_SAMPLE_RATE``
+    добавляется заголовок ``Server-Timing`` и пишется в лог
+    ``core.timing`` строка JSON с именем маршрута. Должен стоять первым в
+    ``MIDDLEWARE``, чтобы учитывать ответы из кэша страниц.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with RequestTiming() as timing, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.execute_wrapper)
+                )
+            request.timing = timing
+            request._timing_view_started = None
+            response = self.get_response(request)
+            if request._timing_view_started is not None:
+                timing.view = (
+                    time.perf_counter() - request._timing_view_started
+                )
+        url_name = _url_name(request)
+        view = url_name or 'unresolved'
+        metrics.REQUEST_LATENCY.observe(timing.total, view=view)
+        metrics.REQUEST_DB_QUERIES.observe(timing.db_queries, view=view)
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return response
+        response['Server-Timing'] = timing.server_timing()
+        logger.info(json.dumps({
+            'url_name': url_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timing.metrics(),
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = current()
+        if timing is not None:
+            timing.view_name = request.resolver_match.view_name
+            request._timing_view_started = time.perf_counter()
+
+
+class ReadReplicaMiddleware:
+    """Отправляет чтение запросов GET и HEAD в реплику (``core.routers``).
+
+    Запросы с другими методами и запросы с cookie
+    ``READ_REPLICA_STICKY_COOKIE`` работают только с основной базой. Cookie
+    ставится на ``READ_REPLICA_STICKY_SECONDS`` секунд, если запрос что-то
+    записал в базу.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.READ_REPLICA_STICKY_COOKIE
+        read_only = (
+            request.method in self.SAFE_METHODS
+            and cookie not in request.COOKIES
+        )
+        with Routing(read_only) as routing:
+            response = self.get_response(request)
+        if routing.wrote:
+            response.set_cookie(
+                cookie, '1',
+                max_age=settings.READ_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
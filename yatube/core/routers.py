@@ -0,0 +1,72 @@
+"""Чтение из реплики для запросов, которые ничего не меняют.
+
+``ReadReplicaMiddleware`` отмечает запросы GET и HEAD как читающие, и
+``ReadReplicaRouter`` отправляет их ``SELECT`` в ``READ_DATABASE``. Запись
+всегда идёт в основную базу ``default``; после первой записи запрос до
+конца читает из неё же. Ответ на запрос с записью ставит cookie
+``READ_REPLICA_STICKY_COOKIE``: ещё ``READ_REPLICA_STICKY_SECONDS``
+секунд запросы пользователя читают из основной базы и видят свои посты,
+даже если реплика отстаёт. Вне запросов (команды, очередь задач) и внутри
+открытой транзакции основной базы чтение тоже идёт в ``default``.
+
+Реплика в памяти (например, тестовое зеркало ``default``) не используется:
+общий кэш SQLite в памяти блокирует таблицы целиком, и второе соединение
+не читает параллельно, а ждёт писателя.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar('read_replica_routing', default=None)
+
+
+class Routing:
+    """Состояние маршрутизации одного запроса."""
+
+    def __init__(self, read_only):
+        self.read_only = read_only
+        self.wrote = False
+
+    def __enter__(self):
+        self._token = _routing.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _routing.reset(self._token)
+
+
+def read_database():
+    """Псевдоним реплики или ``None``, если реплика не настроена."""
+    alias = getattr(settings, 'READ_DATABASE', None)
+    if alias in (None, DEFAULT_DB_ALIAS) or alias not in settings.DATABASES:
+        return None
+    connection = connections[alias]
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return None
+    return alias
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or not routing.read_only:
+            return DEFAULT_DB_ALIAS
+        # Данные незакрытой транзакции видны только её соединению.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return read_database() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.read_only = False
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы: объекты из обеих связываются.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,138 @@
+"""Журнал медленных SQL-запросов.
+
+Обёртка ``execute_wrapper`` ставится на каждое соединение с базой и
+пишет в лог ``core.slow_queries`` строку JSON о каждом запросе дольше
+``SLOW_QUERY_THRESHOLD`` секунд: SQL, отпечаток, представление и шаблон,
+из которых он выполнен. Запросы с одинаковым отпечатком отличаются только
+значениями параметров; для каждого отпечатка процесс один раз добавляет
+в строку план ``EXPLAIN QUERY PLAN``. Команда ``slow_queries`` сводит
+журнал в список худших отпечатков.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .timing import current
+
+logger = logging.getLogger('core.slow_queries')
+
+# Строки, числа и параметры заменяются на «?», списки в IN — на «(...)».
+NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+_explained = set()
+_explained_lock = threading.Lock()
+_explaining = ContextVar('explaining_slow_query', default=False)
+
+
+def normalize(sql):
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: одинаков для запросов, различающихся значениями."""
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def explain(connection, sql, params):
+    """Строки ``EXPLAIN QUERY PLAN`` или ``None``, если план не получить."""
+    if connection.vendor != 'sqlite':
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def _first_time(key):
+    with _explained_lock:
+        if key in _explained:
+            return False
+        _explained.add(key)
+        return True
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None or _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if elapsed >= threshold:
+            record(context['connection'], sql, params, many, elapsed)
+
+
+def record(connection, sql, params, many, elapsed):
+    timing = current()
+    key = fingerprint(sql)
+    entry = {
+        'fingerprint': key,
+        'sql': normalize(sql),
+        'duration_ms': round(elapsed * 1000, 2),
+        'view': timing.view_name if timing else None,
+        'template': timing.template_name if timing else None,
+    }
+    is_select = sql.lstrip()[:6].upper() == 'SELECT'
+    if not many and is_select and _first_time((connection.alias, key)):
+        entry['plan'] = explain(connection, sql, params)
+    logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+def install(connection, **kwargs):
+    """Приёмник ``connection_created``: ставит обёртку на соединение."""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def offenders(lines):
+    """Сводка журнала по отпечаткам, от наибольшего суммарного времени."""
+    groups = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': {},
+            'templates': {},
+            'plan': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        for field, counts in (('view', 'views'), ('template', 'templates')):
+            if entry.get(field):
+                counts = group[counts]
+                counts[entry[field]] = counts.get(entry[field], 0) + 1
+        if entry.get('plan'):
+            group['plan'] = entry['plan']
+    return sorted(
+        groups.values(), key=lambda group: group['total_ms'], reverse=True
+    )
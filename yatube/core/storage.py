@@ -0,0 +1,125 @@
+"""Файловое хранилище, где имя файла — хеш его содержимого.
+
+``posts/photo.jpg`` сохраняется как ``posts/3f/a2/3fa2…e9.jpg``: два
+уровня каталогов по первым символам sha256 держат в каждом каталоге
+немного файлов даже при миллионах картинок, а одинаковые загрузки
+получают одно имя и хранятся один раз.
+
+Файл пишется сразу по итоговому пути без промежуточной копии. Большие
+загрузки Django держит во временном файле, он переносится
+переименованием — для этого ``FILE_UPLOAD_TEMP_DIR`` должен быть на том
+же диске, что и ``MEDIA_ROOT``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+SHARDED_NAME = re.compile(
+    r'(^|/)([0-9a-f]{%d}/){%d}[0-9a-f]{64}(\.\w+)?$'
+    % (SHARD_WIDTH, SHARD_DEPTH)
+)
+
+
+def remember_hash(content, digest):
+    """Запоминает посчитанный sha256: ``_save`` не читает файл снова."""
+    content.content_sha256 = digest
+
+
+def content_hash(content):
+    known = getattr(content, 'content_sha256', None)
+    if known:
+        return known
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(name, digest):
+    """``каталог/ab/cd/<хеш>.<расширение>`` для исходного имени."""
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    shards = [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+def is_sharded(name):
+    return SHARDED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым; занятое имя — тот же файл.
+        return name
+
+    def _save(self, name, content):
+        name = sharded_name(name, content_hash(content))
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            self._touch(full_path)
+            return name
+        self._make_directory(os.path.dirname(full_path))
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                file_move_safe(content.temporary_file_path(), full_path)
+            else:
+                self._write(full_path, content)
+        except FileExistsError:
+            # Тот же файл только что записал параллельный запрос.
+            self._touch(full_path)
+            return name
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    @staticmethod
+    def _touch(full_path):
+        # Файл снова нужен: свежее время изменения защищает его от
+        # сборщика мусора (collect_media_garbage --min-age).
+        try:
+            os.utime(full_path)
+        except FileNotFoundError:
+            pass
+
+    def _make_directory(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+        old_umask = os.umask(0)
+        try:
+            os.makedirs(
+                directory, self.directory_permissions_mode, exist_ok=True
+            )
+        finally:
+            os.umask(old_umask)
+
+    @staticmethod
+    def _write(full_path, content):
+        flags = (
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL
+            | getattr(os, 'O_BINARY', 0)
+        )
+        fd = os.open(full_path, flags, 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    file.write(chunk)
+        except BaseException:
+            # Недописанный файл с «правильным» именем выдавал бы себя
+            # за копию следующих загрузок.
+            os.remove(full_path)
+            raise
@@ -0,0 +1,35 @@
+"""``DjangoTemplates``, который считает время рендера в ``core.timing``.
+
+Шаблоны рендерятся через ``render()``/``render_to_string()`` без
+сигналов, поэтому время считает шаблон этого бэкенда. Вне запроса,
+который измеряет ``RequestTimingMiddleware``, рендер стоит одного
+``ContextVar.get``. Вложенные ``{% include %}`` идут мимо бэкенда и не
+считаются дважды.
+"""
+import time
+
+from django.template.backends import django
+
+from ..timing import current
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        timing = current()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        timing.template_name = self.template.name
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_name = None
+            timing.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,163 @@
+"""Бюджеты производительности страниц для тестов.
+
+``BudgetTestMixin.assertWithinBudget`` запрашивает адрес и сравнивает
+число запросов к базе, промахов кэша и время ответа с ``Budget``. Если
+бюджет превышен, в сообщении перечислены запросы, сгруппированные по
+отпечатку SQL: N+1 виден как один запрос, повторённый много раз.
+
+``TestRunner`` (и фикстура pytest в ``conftest.py``) на время тестов
+переносит кэш, медиа, логи и метрики во временный каталог
+(``IsolatedFiles``): тесты не трогают файлы разработки, а счётчики
+тестовых процессов не попадают в ``/metrics``. ``TempMediaMixin`` даёт
+классу тестов собственный ``MEDIA_ROOT``.
+"""
+import copy
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.log import configure_logging
+
+from .slow_queries import normalize
+
+# None — показатель не проверяется.
+Budget = namedtuple('Budget', 'queries cache_misses time_ms')
+Budget.__new__.__defaults__ = (None, None, None)
+
+# Список столбцов длиннее самого запроса и не отличает один запрос от
+# другого.
+COLUMNS = re.compile(r'^SELECT .+? FROM ')
+
+
+def describe_queries(queries):
+    """Запросы по отпечаткам, повторяющиеся — первыми."""
+    counts = Counter(
+        COLUMNS.sub('SELECT … FROM ', normalize(query['sql']))
+        for query in queries
+    )
+    return '\n'.join(
+        f'  {count:>3} × {sql}' for sql, count in sorted(
+            counts.items(), key=lambda item: (-item[1], item[0])
+        )
+    )
+
+
+class BudgetTestMixin:
+    def assertWithinBudget(self, url, budget, client=None):
+        client = client or self.client
+        # Соединения вне ``databases`` теста закрыты для запросов.
+        aliases = (
+            connections if self.databases == '__all__' else self.databases
+        )
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in aliases
+            ]
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        timing = response.wsgi_request.timing
+        measured = Budget(
+            timing.db_queries, timing.cache_misses,
+            round(timing.total * 1000, 1),
+        )
+        exceeded = [
+            f'{field}: {value} > {limit}'
+            for field, value, limit in zip(Budget._fields, measured, budget)
+            if limit is not None and value > limit
+        ]
+        if exceeded:
+            queries = [
+                query for context in captured
+                for query in context.captured_queries
+            ]
+            self.fail(
+                f'{url} превышает бюджет ({"; ".join(exceeded)}).\n'
+                f'Запросы к базе:\n{describe_queries(queries)}'
+            )
+        return response
+
+
+# Настройки с путями к файлам и имена этих файлов во временном каталоге.
+LOG_FILES = {
+    'REQUEST_LOG_FILE': 'requests.log',
+    'SLOW_QUERY_LOG_FILE': 'slow_queries.log',
+}
+
+
+class IsolatedFiles:
+    """Кэш, медиа, логи и метрики во временном каталоге, удаляемом
+    на выходе."""
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-test-')
+        overrides = {
+            name: os.path.join(self.directory, filename)
+            for name, filename in LOG_FILES.items()
+        }
+        renamed = {
+            getattr(settings, name): path for name, path in overrides.items()
+        }
+        logging = copy.deepcopy(settings.LOGGING)
+        for handler in logging.get('handlers', {}).values():
+            if handler.get('filename') in renamed:
+                handler['filename'] = renamed[handler['filename']]
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, cache in caches.items():
+            if cache['BACKEND'].startswith('core.cache_backends.'):
+                cache['LOCATION'] = os.path.join(
+                    self.directory, f'cache-{alias}.sqlite3'
+                )
+        self.settings = override_settings(
+            **overrides,
+            LOGGING=logging,
+            CACHES=caches,
+            MEDIA_ROOT=os.path.join(self.directory, 'media'),
+            METRICS_DIR=os.path.join(self.directory, 'metrics'),
+        )
+        self.settings.enable()
+        configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.settings.disable()
+        configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        self.isolated_files = IsolatedFiles().__enter__()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.isolated_files.__exit__(None, None, None)
+
+
+class TempMediaMixin:
+    """Свой ``MEDIA_ROOT`` для класса тестов: ``cls.media_root``."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='yatube-media-')
+        cls._media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._media_settings.disable()
+            shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..cache_backends.sqlite import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_are_shared_between_instances(self):
+        self.cache.set('key', {'value': 1})
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertEqual(other.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+
+    def test_incr_add_and_expiry(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('expired', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 'new'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {
+            'MAX_BYTES': 10 * 1024, 'ACCESS_RESOLUTION': 0,
+        }})
+        cache.set('old', 'x' * 4000)
+        cache.set('used', 'x' * 4000)
+        cache.get('used')
+        cache.set('new', 'x' * 4000)
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('used'))
+        self.assertIsNotNone(cache.get('new'))
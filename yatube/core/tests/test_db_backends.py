@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+
+class PragmaTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            for name, value in (('busy_timeout', 5000),
+                                ('cache_size', -20000),
+                                ('temp_store', 2)):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], value, name)
+
+
+class WriteLockTests(TransactionTestCase):
+    def test_lock_held_for_transaction(self):
+        with transaction.atomic():
+            self.assertTrue(connection.write_lock.locked())
+            with transaction.atomic():
+                self.assertTrue(connection.write_lock.locked())
+        self.assertFalse(connection.write_lock.locked())
+
+    def test_lock_released_on_rollback(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                1 / 0
+        self.assertFalse(connection.write_lock.locked())
+
+
+class BenchSQLiteCommandTests(TestCase):
+    def test_tuned_backend_has_no_lock_errors(self):
+        out = StringIO()
+        call_command(
+            'bench_sqlite', workers=[2], threads=2, seconds=0.3,
+            shards=[1, 3], stdout=out,
+        )
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        tuned = [row for row in rows if row[0] == 'tuned']
+        self.assertEqual([row[2] for row in tuned], ['1', '3'])
+        for row in tuned:
+            self.assertEqual(row[-1], '0')
+            self.assertGreater(int(row[4]), 0)
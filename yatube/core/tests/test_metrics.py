@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import metrics
+from ..metrics import MmapValues
+
+User = get_user_model()
+
+
+class MetricsDirMixin:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+
+class MetricsTests(MetricsDirMixin, SimpleTestCase):
+    def test_values_of_all_processes_summed(self):
+        other = MmapValues(os.path.join(self.directory, 'other.db'))
+        self.addCleanup(other.close)
+        other.add(metrics.CACHE_REQUESTS._key(
+            '_total', {'family': 'feedgen', 'result': 'hit'}
+        ), 2)
+        metrics.CACHE_REQUESTS.inc(family='feedgen', result='hit')
+        self.assertIn(
+            'yatube_cache_requests_total{family="feedgen",result="hit"} 3',
+            metrics.exposition(),
+        )
+
+    def test_counter_totals_by_label_values(self):
+        other = MmapValues(os.path.join(self.directory, 'other.db'))
+        self.addCleanup(other.close)
+        other.add(metrics.CACHE_REQUESTS._key(
+            '_total', {'family': 'feedgen', 'result': 'miss'}
+        ), 2)
+        metrics.CACHE_REQUESTS.inc(family='feedgen', result='miss')
+        metrics.CACHE_REQUESTS.inc(family='pagecache', result='hit')
+        self.assertEqual(metrics.CACHE_REQUESTS.totals(), {
+            ('feedgen', 'miss'): 3, ('pagecache', 'hit'): 1,
+        })
+
+    def test_file_grows_and_reopens(self):
+        path = os.path.join(self.directory, 'big.db')
+        values = MmapValues(path)
+        keys = [f'key-{i:05}' * 20 for i in range(1000)]
+        for key in keys:
+            values.add(key, 1.5)
+        values.close()
+        reopened = MmapValues(path)
+        self.addCleanup(reopened.close)
+        reopened.add(keys[-1], 1)
+        self.assertEqual(len(metrics.collect()), len(keys))
+        self.assertEqual(metrics.collect()[keys[-1]], 2.5)
+
+    def test_histogram_buckets_cumulative(self):
+        metrics.REQUEST_DB_QUERIES.observe(1, view='posts:index')
+        metrics.REQUEST_DB_QUERIES.observe(7, view='posts:index')
+        text = metrics.exposition()
+        for line in (
+            'yatube_request_db_queries_bucket{view="posts:index",le="1"} 1',
+            'yatube_request_db_queries_bucket{view="posts:index",le="5"} 1',
+            'yatube_request_db_queries_bucket{view="posts:index",le="10"} 2',
+            'yatube_request_db_queries_bucket{view="posts:index",le="+Inf"} 2',
+            'yatube_request_db_queries_sum{view="posts:index"} 8',
+            'yatube_request_db_queries_count{view="posts:index"} 2',
+        ):
+            self.assertIn(line, text)
+
+    def test_help_and_type_named_as_samples(self):
+        lines = metrics.exposition().splitlines()
+        for family, kind in (
+            ('yatube_cache_requests_total', 'counter'),
+            ('yatube_request_db_queries', 'histogram'),
+        ):
+            self.assertIn(f'# TYPE {family} {kind}', lines)
+            self.assertIn(
+                f'# HELP {family}',
+                [' '.join(line.split()[:3]) for line in lines],
+            )
+
+    def test_key_family(self):
+        for key, family in (
+            ('feedgen:index', 'feedgen'),
+            ('pagecache:hits:index', 'pagecache'),
+            ('template.cache.feed.0a1b2c', 'template.cache.feed'),
+            ('sorl-thumbnail||image||0a1b2c', 'sorl-thumbnail||image'),
+        ):
+            self.assertEqual(metrics.key_family(key), family)
+
+
+class MetricsEndpointTests(MetricsDirMixin, TestCase):
+    def test_endpoint_reports_requests_and_created_objects(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовый пост', author=author)
+        client = Client()
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('yatube_created_total{model="post"} 1', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            text,
+        )
+        self.assertIn('yatube_cache_requests_total{family="feedgen"', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=())
+    def test_endpoint_hidden_from_other_addresses(self):
+        response = Client().get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,56 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..timing import RequestTiming
+
+User = get_user_model()
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовый пост', author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_timing(self):
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = Client().get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('db;', 'cache;', 'template;', 'view;', 'total;'):
+            self.assertIn(metric, header)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['url_name'], 'posts:index')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['db_queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+        self.assertIn(f'desc="{line["db_queries"]} queries"', header)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_request_outside_sample_not_measured(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class TemplateTimingTests(SimpleTestCase):
+    def test_only_project_backend_timed_inside_request(self):
+        stock = DjangoTemplates({
+            'NAME': 'stock', 'DIRS': [], 'APP_DIRS': False, 'OPTIONS': {},
+        })
+        self.assertEqual(engines['django'].from_string('x').render(), 'x')
+        with RequestTiming() as timing:
+            stock.from_string('x').render()
+            self.assertEqual(timing.template_time, 0)
+            engines['django'].from_string('x').render()
+            self.assertGreater(timing.template_time, 0)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.middleware import ReadReplicaMiddleware
+from core.routers import ReadReplicaRouter, Routing, _routing
+from posts.models import Follow, Post
+
+User = get_user_model()
+COOKIE = 'db_primary'
+
+
+def replica_on_disk():
+    return mock.patch.object(
+        connections['replica'], 'is_in_memory_db', return_value=False
+    )
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def test_reads_outside_request_go_to_primary(self):
+        with replica_on_disk():
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_read_only_request_reads_from_replica(self):
+        with replica_on_disk(), Routing(read_only=True):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_write_switches_request_to_primary(self):
+        with replica_on_disk(), Routing(read_only=True) as routing:
+            self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertTrue(routing.wrote)
+
+    def test_open_transaction_reads_from_primary(self):
+        with replica_on_disk(), Routing(read_only=True), mock.patch.object(
+            connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True
+        ):
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_in_memory_replica_not_used(self):
+        with Routing(read_only=True):
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+class ReadReplicaMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def routed(self, request):
+        states = []
+
+        def get_response(request):
+            states.append(_routing.get().read_only)
+            return HttpResponse()
+
+        response = ReadReplicaMiddleware(get_response)(request)
+        return states[0], response
+
+    def test_safe_methods_are_read_only(self):
+        factory = RequestFactory()
+        self.assertTrue(self.routed(factory.get('/'))[0])
+        self.assertTrue(self.routed(factory.head('/'))[0])
+        self.assertFalse(self.routed(factory.post('/'))[0])
+
+    def test_sticky_cookie_keeps_reads_on_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[COOKIE] = '1'
+        read_only, response = self.routed(request)
+        self.assertFalse(read_only)
+        self.assertNotIn(COOKIE, response.cookies)
+
+    def test_anonymous_read_sets_no_cookie(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn(COOKIE, response.cookies)
+
+    def test_write_in_get_view_sets_sticky_cookie(self):
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(response.cookies[COOKIE]['max-age'], 10)
@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import slow_queries
+
+User = get_user_model()
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_queries_differing_in_values_share_fingerprint(self):
+        first = (
+            "SELECT * FROM posts_post WHERE id IN (1, 2, 3) "
+            "AND text = 'a''b'"
+        )
+        second = "SELECT *  FROM posts_post WHERE id IN (%s) AND text = %s"
+        self.assertEqual(
+            slow_queries.normalize(first),
+            'SELECT * FROM posts_post WHERE id IN (...) AND text = ?',
+        )
+        self.assertEqual(
+            slow_queries.fingerprint(first), slow_queries.fingerprint(second)
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовый пост', author=author)
+
+    def setUp(self):
+        cache.clear()
+        slow_queries._explained.clear()
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_query_logged_with_view_template_and_plan(self):
+        with self.assertLogs('core.slow_queries') as logs:
+            Client().get(reverse('posts:index'))
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        from_view = [
+            entry for entry in entries
+            if entry['view'] == 'posts:index'
+            and 'posts_post' in entry['sql']
+        ]
+        self.assertTrue(from_view)
+        self.assertTrue(any(entry.get('plan') for entry in from_view))
+        self.assertTrue(any(
+            entry['template'] == 'posts/index.html' for entry in entries
+        ))
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_plan_captured_once_per_fingerprint(self):
+        with self.assertLogs('core.slow_queries') as logs:
+            for _ in range(2):
+                list(Post.objects.filter(text='Тестовый пост'))
+        entries = [
+            json.loads(record.getMessage()) for record in logs.records
+        ]
+        self.assertEqual(len(entries), 2)
+        self.assertIn('plan', entries[0])
+        self.assertNotIn('plan', entries[1])
+
+
+class SlowQueriesCommandTests(SimpleTestCase):
+    def test_top_offenders_grouped_by_fingerprint(self):
+        lines = [
+            {'fingerprint': 'a', 'sql': 'SELECT a', 'duration_ms': 150,
+             'view': 'posts:index', 'template': None,
+             'plan': ['SCAN posts_post']},
+            {'fingerprint': 'a', 'sql': 'SELECT a', 'duration_ms': 250,
+             'view': 'posts:index', 'template': None},
+            {'fingerprint': 'b', 'sql': 'SELECT b', 'duration_ms': 300,
+             'view': 'posts:profile', 'template': None},
+        ]
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.log', delete=False
+        ) as log:
+            log.write('\n'.join(json.dumps(line) for line in lines))
+        self.addCleanup(os.remove, log.name)
+        out = StringIO()
+        call_command('slow_queries', log=log.name, top=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('a: 2 раз, всего 400.0 мс, максимум 250.0 мс', output)
+        self.assertIn('представления: posts:index (2)', output)
+        self.assertIn('план: SCAN posts_post', output)
+        self.assertNotIn('SELECT b', output)
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import SimpleTestCase
+
+from ..storage import ContentAddressedStorage, remember_hash
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_name_is_sharded_content_hash(self):
+        digest = hashlib.sha256(b'picture').hexdigest()
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'picture'))
+        self.assertEqual(
+            name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'picture')
+
+    def test_remembered_hash_not_recomputed(self):
+        content = ContentFile(b'picture')
+        remember_hash(content, 'f' * 64)
+        name = self.storage.save('posts/photo.jpg', content)
+        self.assertEqual(name, f'posts/ff/ff/{"f" * 64}.jpg')
+
+    def test_identical_uploads_stored_once(self):
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            file_name
+            for _, _, file_names in os.walk(self.location)
+            for file_name in file_names
+        ]
+        self.assertEqual(len(files), 2)
+
+    def test_temporary_upload_is_moved(self):
+        upload = TemporaryUploadedFile('big.gif', 'image/gif', 4, None)
+        upload.write(b'data')
+        upload.flush()
+        temporary_path = upload.temporary_file_path()
+        name = self.storage.save('posts/big.gif', upload)
+        upload.close()
+        self.assertFalse(os.path.exists(temporary_path))
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'data')
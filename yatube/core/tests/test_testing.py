@@ -0,0 +1,60 @@
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..testing import Budget, BudgetTestMixin, describe_queries
+
+User = get_user_model()
+
+
+class DescribeQueriesTests(SimpleTestCase):
+    def test_repeated_queries_grouped_and_listed_first(self):
+        queries = [
+            {'sql': 'SELECT "id", "username" FROM "auth_user" '
+                    f'WHERE "id" = {pk}'}
+            for pk in range(10)
+        ] + [{'sql': 'SELECT "id" FROM "posts_post" LIMIT 10'}]
+        self.assertEqual(
+            describe_queries(queries).splitlines(),
+            [
+                '   10 × SELECT … FROM "auth_user" WHERE "id" = ?',
+                '    1 × SELECT … FROM "posts_post" LIMIT ?',
+            ],
+        )
+
+
+class BudgetTests(BudgetTestMixin, TestCase):
+    def test_exceeded_budget_lists_queries(self):
+        user = User.objects.create_user(username='reader')
+        self.client.force_login(user)
+        with self.assertRaisesMessage(AssertionError, 'queries: '):
+            self.assertWithinBudget(
+                reverse('posts:follow_index'), Budget(queries=0)
+            )
+        self.assertWithinBudget(
+            reverse('posts:follow_index'), Budget(queries=10)
+        )
+
+
+class IsolatedFilesTests(SimpleTestCase):
+    def test_files_of_test_run_in_temp_directory(self):
+        temp = os.path.realpath(tempfile.gettempdir())
+        paths = [
+            settings.MEDIA_ROOT, settings.METRICS_DIR,
+            settings.REQUEST_LOG_FILE, settings.SLOW_QUERY_LOG_FILE,
+            settings.CACHES['default']['LOCATION'],
+        ]
+        for name in ('core.timing', 'core.slow_queries'):
+            paths += [
+                handler.baseFilename
+                for handler in logging.getLogger(name).handlers
+            ]
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertTrue(os.path.realpath(path).startswith(temp))
+                self.assertFalse(path.startswith(settings.BASE_DIR))
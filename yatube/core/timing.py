@@ -0,0 +1,82 @@
+"""Счётчики времени текущего запроса для ``RequestTimingMiddleware``.
+
+Запрос кладёт свой ``RequestTiming`` в ``ContextVar``; запросы к базе,
+кэшу и рендер шаблонов (бэкенд ``core.template_backends.django``)
+добавляют в него время и количество. Вне запроса (команды, задачи
+очереди) функции записи сводятся к одному ``ContextVar.get``.
+"""
+import time
+from contextvars import ContextVar
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Имя представления и шаблона, которые сейчас выполняются, — для
+        # журнала медленных запросов.
+        self.view_name = None
+        self.template_name = None
+        self.view = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.template_time = 0.0
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self._token)
+        self.total = time.perf_counter() - self.started
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper`` для запросов к базе."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def metrics(self):
+        """Метрики в миллисекундах для заголовка и лога."""
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'view_ms': round(self.view * 1000, 2),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+        }
+
+    def server_timing(self):
+        metrics = self.metrics()
+        return ', '.join([
+            'db;dur={db_ms};desc="{db_queries} queries"',
+            'cache;dur={cache_ms};desc="{cache_hits} hits, '
+            '{cache_misses} misses"',
+            'template;dur={template_ms}',
+            'view;dur={view_ms}',
+            'total;dur={total_ms}',
+        ]).format(**metrics)
+
+
+def current():
+    """``RequestTiming`` текущего запроса или ``None``."""
+    return _current.get()
+
+
+def record_cache(hits, misses, elapsed):
+    """Вызывается кэш-бэкендом после чтения ключей."""
+    timing = _current.get()
+    if timing is not None:
+        timing.cache_hits += hits
+        timing.cache_misses += misses
+        timing.cache_time += elapsed
@@ -0,0 +1,42 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import enqueue_periodic
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из очереди. Можно запустить несколько '
+        'воркеров одновременно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.',
+        )
+        parser.add_argument('--worker-id', default=None)
+        parser.add_argument(
+            '--sleep', type=float, default=settings.JOBS_POLL_INTERVAL
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['worker_id'])
+        if options['once']:
+            enqueue_periodic()
+            done = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+        stopping = []
+
+        def stop(signum, frame):
+            # Текущая задача доделывается, новые не берутся.
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'Воркер {worker.worker_id} запущен')
+        worker.run_forever(options['sleep'], should_stop=lambda: stopping)
@@ -0,0 +1,98 @@
+"""Очередь отложенных задач в базе данных.
+
+Задача — функция, объявленная в модуле ``tasks.py`` любого приложения
+с декоратором ``@task``. Постановка в очередь — это запись строки ``Job``
+в текущей транзакции: если транзакция откатится, задачи не будет, а
+воркер (``manage.py run_jobs``) увидит её только после фиксации.
+"""
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, retry_delay, every):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.every = every
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, args, kwargs)
+
+    def retry_at(self, attempts, now):
+        """Экспоненциальная задержка: 1, 2, 4… интервала ``retry_delay``."""
+        return now + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+
+
+def task(name=None, max_attempts=5, retry_delay=10, every=None):
+    """Регистрирует функцию как задачу очереди.
+
+    ``every`` — ``timedelta`` для периодической задачи: воркер ставит её
+    в очередь один раз на каждый такой интервал.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = Task(
+            func, task_name, max_attempts, retry_delay, every
+        )
+        return registry[task_name]
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, key=None, run_at=None, once=False):
+    """Ставит задачу в очередь и возвращает её ``Job``.
+
+    Если задача с ключом ``key`` ждёт в очереди или выполняется, новая не
+    создаётся; выполненная или упавшая окончательно задача заменяется
+    новой. С ``once=True`` ключ не даёт поставить задачу повторно и после
+    выполнения — так периодические задачи запускаются раз за интервал.
+    """
+    task_ = registry[name]
+    if key is not None:
+        finished = [Job.FAILED] if once else [Job.DONE, Job.FAILED]
+        Job.objects.filter(key=key, status__in=finished).delete()
+        existing = Job.objects.filter(key=key).first()
+        if existing is not None:
+            return existing
+    job = Job(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        key=key,
+        max_attempts=task_.max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if key is None:
+            raise
+        return Job.objects.get(key=key)
+    return job
+
+
+def enqueue_periodic(now=None):
+    """Ставит в очередь периодические задачи текущего интервала."""
+    now = now or timezone.now()
+    for task_ in registry.values():
+        if task_.every is None:
+            continue
+        period = task_.every.total_seconds()
+        slot = int(now.timestamp() // period)
+        enqueue(
+            task_.name,
+            key=f'{task_.name}@{slot}',
+            once=True,
+            run_at=now.fromtimestamp(slot * period, tz=now.tzinfo),
+        )
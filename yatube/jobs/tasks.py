@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+
+
+@task(name='jobs.purge', every=timedelta(hours=1))
+def purge():
+    """Удаляет старые задачи.
+
+    Выполненные хранятся ``JOBS_KEEP_DONE``, упавшие — ``JOBS_KEEP_FAILED``.
+    """
+    now = timezone.now()
+    Job.objects.filter(
+        Q(status=Job.DONE, finished__lt=now - settings.JOBS_KEEP_DONE)
+        | Q(status=Job.FAILED, finished__lt=now - settings.JOBS_KEEP_FAILED)
+    ).delete()
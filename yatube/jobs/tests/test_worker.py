@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Job
+from ..queue import enqueue, enqueue_periodic, task
+from ..worker import Worker
+
+User = get_user_model()
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.broken', max_attempts=2, retry_delay=30)
+def broken():
+    raise RuntimeError('broken')
+
+
+@task(name='tests.hourly', every=timedelta(hours=1))
+def hourly():
+    calls.append('hourly')
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker('test')
+
+    def test_worker_runs_queued_job(self):
+        job = enqueue('tests.record', ('value',))
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, ['value'])
+
+    def test_idempotency_key_creates_job_once(self):
+        first = enqueue('tests.record', (1,), key='record:1')
+        second = enqueue('tests.record', (2,), key='record:1')
+        self.assertEqual(first.pk, second.pk)
+        self.worker.run_pending()
+        self.assertEqual(calls, [1])
+
+    def test_failed_job_retried_with_backoff(self):
+        job = enqueue('tests.broken')
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError', job.last_error)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_job_with_expired_lease_is_reclaimed(self):
+        job = enqueue('tests.record', ('lost',))
+        self.assertIsNotNone(Worker('crashed').claim())
+        self.assertIsNone(self.worker.claim())
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.worker.claim().pk, job.pk)
+
+    def test_expired_lease_on_last_attempt_fails_job(self):
+        job = enqueue('tests.record', ('lost',))
+        Worker('crashed').claim()
+        Job.objects.filter(pk=job.pk).update(
+            attempts=job.max_attempts,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertIsNone(self.worker.claim())
+        self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertEqual(calls, [])
+
+    def test_failed_job_key_can_be_enqueued_again(self):
+        failed = enqueue('tests.broken', key='broken:1')
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED)
+        job = enqueue('tests.record', ('again',), key='broken:1')
+        self.assertNotEqual(job.pk, failed.pk)
+        self.worker.run_pending()
+        self.assertEqual(calls, ['again'])
+
+    def test_done_job_key_can_be_enqueued_again(self):
+        done = enqueue('tests.record', (1,), key='record:1')
+        self.worker.run_pending()
+        job = enqueue('tests.record', (2,), key='record:1')
+        self.assertNotEqual(job.pk, done.pk)
+        self.worker.run_pending()
+        self.assertEqual(calls, [1, 2])
+
+    def test_periodic_task_queued_once_per_interval(self):
+        enqueue_periodic()
+        enqueue_periodic()
+        self.assertEqual(Job.objects.filter(name='tests.hourly').count(), 1)
+        self.worker.run_pending()
+        enqueue_periodic()
+        self.worker.run_pending()
+        self.assertEqual(calls.count('hourly'), 1)
+
+    def test_password_reset_email_sent_by_worker(self):
+        User.objects.create_user(
+            username='reader', email='r@example.com', password='secret'
+        )
+        Client().post(
+            reverse('users:password_reset'), {'email': 'r@example.com'}
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Job.objects.filter(name='users.send_email').exists())
+        self.worker.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['r@example.com'])
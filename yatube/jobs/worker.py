@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .queue import enqueue_periodic, registry
+
+logger = logging.getLogger(__name__)
+
+# Сколько кандидатов читать за раз: остальные воркеры могут успеть
+# забрать часть из них.
+CLAIM_BATCH = 10
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Worker:
+    """Выполняет задачи из ``Job``; воркеров может быть несколько.
+
+    Задача захватывается условным ``UPDATE``: из нескольких процессов,
+    выбравших одну строку, обновит её только один. Захват действует
+    ``JOBS_LEASE`` секунд, после чего задачу упавшего воркера заберёт
+    другой.
+    """
+
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or default_worker_id()
+        self.lease = timedelta(seconds=settings.JOBS_LEASE)
+
+    def _available(self, now):
+        return (
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now)
+        ) & Q(attempts__lt=F('max_attempts'))
+
+    def fail_abandoned(self):
+        """Отмечает упавшими брошенные задачи без оставшихся попыток."""
+        now = timezone.now()
+        return Job.objects.filter(
+            status=Job.RUNNING,
+            locked_until__lt=now,
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=Job.FAILED,
+            locked_until=None,
+            finished=now,
+            last_error='Захват истёк, попытки исчерпаны',
+        )
+
+    def claim(self):
+        now = timezone.now()
+        available = self._available(now)
+        candidates = Job.objects.filter(available).order_by(
+            'run_at', 'id'
+        ).values_list('pk', flat=True)[:CLAIM_BATCH]
+        for pk in candidates:
+            claimed = Job.objects.filter(available, pk=pk).update(
+                status=Job.RUNNING,
+                locked_by=self.worker_id,
+                locked_until=now + self.lease,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+        return None
+
+    def execute(self, job):
+        now = timezone.now()
+        task_ = registry.get(job.name)
+        try:
+            if task_ is None:
+                raise LookupError(f'Неизвестная задача {job.name}')
+            payload = json.loads(job.payload)
+            task_(*payload['args'], **payload['kwargs'])
+        except Exception as error:
+            # Полный traceback сохраняется в last_error.
+            logger.warning('Задача %s #%s упала: %r', job.name, job.pk, error)
+            job.last_error = traceback.format_exc()
+            if task_ is not None and job.attempts < job.max_attempts:
+                job.status = Job.QUEUED
+                job.run_at = task_.retry_at(job.attempts, now)
+            else:
+                job.status = Job.FAILED
+                job.finished = now
+        else:
+            job.status = Job.DONE
+            job.finished = timezone.now()
+        job.locked_until = None
+        # Задачу могли забрать после истечения захвата — тогда её
+        # результат запишет новый владелец.
+        Job.objects.filter(pk=job.pk, locked_by=self.worker_id).update(
+            status=job.status,
+            run_at=job.run_at,
+            locked_until=None,
+            last_error=job.last_error,
+            finished=job.finished,
+        )
+        return job
+
+    def run_pending(self, limit=None):
+        """Выполняет готовые задачи, пока они есть; возвращает их число."""
+        done = 0
+        self.fail_abandoned()
+        while limit is None or done < limit:
+            job = self.claim()
+            if job is None:
+                break
+            self.execute(job)
+            done += 1
+        return done
+
+    def run_forever(self, sleep, should_stop=lambda: False):
+        while not should_stop():
+            close_old_connections()
+            enqueue_periodic()
+            if not self.run_pending(limit=100):
+                time.sleep(sleep)
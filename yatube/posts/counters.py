@@ -0,0 +1,101 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import (Count, F, IntegerField, OuterRef, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce
+
+from . import sharding
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def increment(user_id, field):
+    UserStats.objects.get_or_create(user_id=user_id)
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1}
+    )
+
+
+def decrement(user_id, field):
+    UserStats.objects.filter(
+        user_id=user_id, **{f'{field}__gt': 0}
+    ).update(**{field: F(field) - 1})
+
+
+def change_comments_count(post_id, delta):
+    queryset = sharding.for_post(Post.objects, post_id).filter(pk=post_id)
+    if delta < 0:
+        queryset = queryset.filter(comments_count__gt=0)
+    queryset.update(comments_count=F('comments_count') + delta)
+
+
+def _count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _posts_per_author():
+    totals = Counter()
+    for posts in sharding.querysets(Post.objects.order_by()):
+        totals.update(dict(
+            posts.values_list('author_id').annotate(total=Count('pk'))
+        ))
+    return totals
+
+
+def _save_batch(batch, existing):
+    UserStats.objects.bulk_create(
+        [stats for stats in batch if stats.user_id not in existing]
+    )
+    UserStats.objects.bulk_update(
+        [stats for stats in batch if stats.user_id in existing],
+        ['posts_count', 'followers_count', 'following_count'],
+    )
+
+
+def repair():
+    """Пересчитывает все счётчики пакетными запросами."""
+    for posts in sharding.querysets(Post.objects):
+        posts.update(comments_count=_count_of(Comment.objects, 'post'))
+    posts_total, posts_of = _count_of(Post.objects, 'author'), None
+    if sharding.enabled():
+        # Подзапрос видит посты только одной базы.
+        posts_total = Value(0, output_field=IntegerField())
+        posts_of = _posts_per_author()
+    users = User.objects.annotate(
+        posts_total=posts_total,
+        followers_total=_count_of(Follow.objects, 'author'),
+        following_total=_count_of(Follow.objects, 'user'),
+    ).values_list(
+        'pk', 'posts_total', 'followers_total', 'following_total'
+    ).order_by('pk')
+    existing = set(UserStats.objects.values_list('user_id', flat=True))
+    batch, total = [], 0
+    for pk, posts, followers, following in users.iterator():
+        if posts_of is not None:
+            posts = posts_of[pk]
+        batch.append(UserStats(
+            user_id=pk,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        ))
+        if len(batch) == BATCH_SIZE:
+            _save_batch(batch, existing)
+            total += len(batch)
+            batch = []
+    _save_batch(batch, existing)
+    return total + len(batch)
@@ -0,0 +1,132 @@
+"""Версионированный кэш фрагментов лент.
+
+У каждой ленты (``index``, ``group``, ``profile``, ``follow``) и у каждого
+поста есть счётчик поколений. Ключ фрагмента включает номера поколений и
+страницу, поэтому сигналы моделей не удаляют фрагменты, а лишь увеличивают
+поколение затронутых лент — старые записи вытесняются по таймауту.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils import CURSOR_PARAM
+
+GENERATION_PREFIX = 'feedgen'
+MODIFIED_PREFIX = 'feedmod'
+
+
+def _key(prefix, scope):
+    return ':'.join([prefix, *(quote(str(part), safe='') for part in scope)])
+
+
+def _initial():
+    # Счётчик, потерянный при очистке кэша, не должен начинаться заново
+    # с уже использованного значения.
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    keys = [_key(GENERATION_PREFIX, scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    for key, value in missing.items():
+        if cache.add(key, value, timeout=None):
+            # Новое поколение: момент изменения неизвестен, берём текущий.
+            cache.set(
+                MODIFIED_PREFIX + key[len(GENERATION_PREFIX):],
+                time.time(), timeout=None,
+            )
+        else:
+            missing[key] = cache.get(key, value)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def last_modified(*scopes):
+    """Время последнего изменения лент или ``None``, если оно неизвестно."""
+    keys = [_key(MODIFIED_PREFIX, scope) for scope in scopes]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    return max(found.values())
+
+
+def bump(*scopes):
+    now = time.time()
+    for scope in scopes:
+        key = _key(GENERATION_PREFIX, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), timeout=None)
+    cache.set_many(
+        {_key(MODIFIED_PREFIX, scope): now for scope in scopes},
+        timeout=None,
+    )
+
+
+def feed_cache_context(request, *scopes):
+    """Ключ и таймаут для ``{% cache %}`` во фрагменте ленты."""
+    position = request.GET.get(CURSOR_PARAM)
+    if position is None:
+        position = 'page-' + request.GET.get('page', '1')
+    # Номера поколений разных лент могут совпасть: в ключе и сама лента.
+    parts = [
+        f'{_key(GENERATION_PREFIX, scope)}={generation}'
+        for scope, generation in zip(scopes, generations(*scopes))
+    ]
+    return {
+        'feed_cache_key': ':'.join([*parts, position]),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def route_scopes(match):
+    """Ленты, от которых зависит страница, или ``None``: не кэшировать."""
+    if match.namespace != 'posts':
+        return None
+    if match.url_name == 'index':
+        return [('index',)]
+    if match.url_name == 'group_list':
+        return [('group', match.kwargs['slug'])]
+    if match.url_name == 'profile':
+        return [('profile', match.kwargs['username']), ('groups',)]
+    if match.url_name == 'post_detail':
+        return [('index',), ('post', match.kwargs['post_id'])]
+    if match.url_name == 'post_comments':
+        return [('post', match.kwargs['post_id'])]
+    return None
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag страницы из поколений её лент: одно чтение ``get_many``."""
+    scopes = route_scopes(request.resolver_match)
+    reader = [str(request.user.pk)]
+    if request.user.is_authenticated:
+        # Кнопки подписки зависят от подписок читателя.
+        scopes.append(('follow', request.user.pk))
+        # В формах страницы — токен CSRF. Вход меняет и секрет CSRF, и
+        # ключ сессии: после повторного входа старая копия страницы
+        # отправила бы форму с прежним токеном и получила 403.
+        reader.append(request.session.session_key or '')
+    source = '|'.join([
+        request.get_full_path(),
+        *reader,
+        *(str(value) for value in generations(*scopes)),
+    ])
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def page_last_modified(request, *args, **kwargs):
+    # Страница авторизованного пользователя зависит и от его подписок,
+    # поэтому для неё полагаемся только на ETag.
+    if request.user.is_authenticated:
+        return None
+    timestamp = last_modified(*route_scopes(request.resolver_match))
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
@@ -0,0 +1,79 @@
+"""Метаданные картинок постов.
+
+Размеры, формат, размер файла и sha256 читаются один раз, пока
+загруженный файл ещё в памяти или во временном файле, и сохраняются в
+полях ``Post.image_*``. ``ImageField.width_field`` не используется: он
+подключает обработчик ``post_init``, который работает при загрузке
+каждого поста из базы.
+"""
+import hashlib
+
+from PIL import Image
+
+from core.storage import remember_hash
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_metadata(file):
+    """Значения полей ``Post.image_*`` для открытого файла картинки."""
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    # Pillow читает только заголовок, пиксели не декодируются.
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': size,
+        'image_format': image_format.lower(),
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def _set(post, values):
+    for field, value in values.items():
+        setattr(post, field, value)
+    return values
+
+
+def clear_metadata(post):
+    return _set(post, {
+        'image_width': None,
+        'image_height': None,
+        'image_size': None,
+        'image_format': '',
+        'image_hash': '',
+    })
+
+
+def fill_metadata(post):
+    """Заполняет ``post.image_*`` из ``post.image``."""
+    image = post.image
+    if not image:
+        return clear_metadata(post)
+    was_closed = image.closed
+    image.open('rb')
+    try:
+        values = read_metadata(image)
+    finally:
+        if was_closed:
+            image.close()
+    if not image._committed:
+        # Этот же объект файла получит хранилище при сохранении поста.
+        remember_hash(image.file, values['image_hash'])
+    return _set(post, values)
+
+
+def size_of(post):
+    """``(ширина, высота)`` картинки или ``None``, если они неизвестны."""
+    if post.image_width and post.image_height:
+        return post.image_width, post.image_height
+    return None
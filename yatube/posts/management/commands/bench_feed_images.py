@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+
+# Ширина картинки в физических пикселях при sizes="(max-width: 992px)
+# 100vw, 960px" из includes/post_image.html.
+CLIENTS = (
+    ('телефон 360px, DPR 2', 720),
+    ('планшет 768px, DPR 2', 1536),
+    ('ноутбук 1280px, DPR 1', 960),
+)
+
+
+def choose(candidates, needed):
+    """Миниатюра, которую выберет браузер из srcset: самая узкая из
+    достаточно широких или самая широкая."""
+    for width, size in candidates:
+        if width >= needed:
+            return size
+    return candidates[-1][1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сколько байт картинок загружает первая страница главной ленты '
+        'до и после srcset/WebP для разных устройств.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=1,
+            help='Сколько первых страниц ленты учитывать.',
+        )
+
+    def handle(self, *args, **options):
+        count = settings.PAGINATION_NUMBER * options['pages']
+        posts = [
+            post for post in Post.objects.all()[:count] if post.image
+        ]
+        if not posts:
+            self.stdout.write('В ленте нет картинок.')
+            return
+        variants = thumbnails.variants()
+        before = 0
+        after = {client: 0 for client, _ in CLIENTS}
+        counted = 0
+        for post in posts:
+            sizes = self.sizes(post, variants)
+            if sizes is None:
+                self.stderr.write(f'Нет миниатюр для {post.image.name}')
+                continue
+            counted += 1
+            # До srcset — одна самая широкая миниатюра из POST_IMAGE_WIDTHS
+            # в запасном формате.
+            before += sizes[-1]
+            preferred = [
+                (variant.width, size)
+                for variant, size in zip(variants, sizes)
+                if variant.format == variants[0].format
+            ]
+            for client, needed in CLIENTS:
+                after[client] += choose(preferred, needed)
+        if not counted:
+            return
+        self.stdout.write(
+            f'Картинок: {counted}, форматы: '
+            f'{", ".join(thumbnails.supported_formats())}'
+        )
+        self.stdout.write(f'{"":<24}{"до":>12}{"после":>12}{"":>8}')
+        for client, total in after.items():
+            saving = 100 * (before - total) / before
+            self.stdout.write(
+                f'{client:<24}{before:>12}{total:>12}{saving:>7.0f}%'
+            )
+
+    def sizes(self, post, variants):
+        """Размеры файлов миниатюр поста в порядке ``variants``;
+        недостающие создаются. ``None``, если создать их не удалось."""
+        found = thumbnails.cached_thumbnails(post.image, variants)
+        if any(thumbnail is None for thumbnail in found):
+            thumbnails.pregenerate(post.image.name)
+            found = thumbnails.cached_thumbnails(post.image, variants)
+        if any(thumbnail is None for thumbnail in found):
+            return None
+        return [default.storage.size(thumbnail.name) for thumbnail in found]
@@ -0,0 +1,238 @@
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Значение ранга ``rank`` (метод ближайшего ранга)."""
+    ordered = sorted(values)
+    index = max(0, -(-rank * len(ordered) // 100) - 1)
+    return ordered[index]
+
+
+def environ(path, query='', cookie=''):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест страниц posts: каждый адрес запрашивается через '
+        'WSGI-приложение в этом же процессе; p50/p95/p99 времени ответа, '
+        'запросы к базе и память на запрос пишутся в JSON. Данные — '
+        'seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на каждый адрес.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Запросов на прогрев кэшей перед замерами.',
+        )
+        parser.add_argument(
+            '--output', default='bench.json',
+            help='Файл с результатами в JSON.',
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Метка прогона, например версия или коммит.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона: показать изменение p95.',
+        )
+
+    def handle(self, *args, **options):
+        self.application = WSGIHandler()
+        cases = self.cases()
+        results = {}
+        for name, path, query, cookie in cases:
+            for _ in range(options['warmup']):
+                self.request(path, query, cookie)
+            results[name] = self.measure(
+                path, query, cookie, options['requests']
+            )
+        report = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': options['requests'],
+            'dataset': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                baseline = json.load(previous)['results']
+        self.print_report(results, baseline)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+    def cases(self):
+        """``(имя, путь, строка запроса, cookie)`` для каждого адреса."""
+        post = Post.objects.annotate(
+            total=Count('comments')
+        ).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        reader = User.objects.annotate(
+            total=Count('follower')
+        ).order_by('-total').first()
+        if post is None or group is None or reader is None:
+            raise CommandError('Нет данных: сначала запустите seed_bench.')
+        word = post.text.split()[0].strip('.,')
+        reader_cookie = self.login(reader)
+        author_cookie = self.login(post.author)
+        return [
+            ('index', reverse('posts:index'), '', ''),
+            ('index_page_2', reverse('posts:index'), 'page=2', ''),
+            ('group_list', reverse('posts:group_list', args=[group.slug]),
+             '', ''),
+            ('profile',
+             reverse('posts:profile', args=[post.author.username]), '', ''),
+            ('post_detail', reverse('posts:post_detail', args=[post.pk]),
+             '', ''),
+            ('post_comments',
+             reverse('posts:post_comments', args=[post.pk]), '', ''),
+            ('search', reverse('posts:search'), urlencode({'q': word}), ''),
+            ('search_api', reverse('posts:search_api'),
+             urlencode({'q': word}), ''),
+            ('index_logged_in', reverse('posts:index'), '', reader_cookie),
+            ('follow_index', reverse('posts:follow_index'), '',
+             reader_cookie),
+            ('create_post', reverse('posts:create_post'), '', author_cookie),
+            ('post_edit', reverse('posts:post_edit', args=[post.pk]), '',
+             author_cookie),
+        ]
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}=' + (
+            client.cookies[settings.SESSION_COOKIE_NAME].value
+        )
+
+    def request(self, path, query, cookie):
+        status = []
+        body = self.application(
+            environ(path, query, cookie),
+            lambda code, headers, exc_info=None: status.append(code),
+        )
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return int(status[0].split()[0])
+
+    def measure(self, path, query, cookie, count):
+        timings = []
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            for _ in range(count):
+                started = time.perf_counter()
+                status = self.request(path, query, cookie)
+                timings.append((time.perf_counter() - started) * 1000)
+        # Трассировка памяти замедляет запрос в разы, поэтому память
+        # меряется отдельным запросом после замеров времени.
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            self.request(path, query, cookie)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'path': path + (f'?{query}' if query else ''),
+            'status': status,
+            **{
+                f'p{rank}_ms': round(percentile(timings, rank), 2)
+                for rank in PERCENTILES
+            },
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'queries': round(counter.count / count, 1),
+            'alloc_peak_kb': round((peak - before) / 1024, 1),
+        }
+
+    def print_report(self, results, baseline):
+        self.stdout.write(
+            f'{"адрес":<18}{"код":>5}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"запр.":>7}{"КБ":>9}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<18}{result["status"]:>5}'
+                f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["queries"]:>7}'
+                f'{result["alloc_peak_kb"]:>9}'
+            )
+            previous = baseline.get(name)
+            if previous and previous['p95_ms']:
+                change = 100 * (
+                    result['p95_ms'] - previous['p95_ms']
+                ) / previous['p95_ms']
+                line += f'{change:>+8.0f}%'
+            self.stdout.write(line)
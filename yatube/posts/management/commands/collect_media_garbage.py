@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import media_gc
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, их '
+        'миниатюры и записи sorl-thumbnail, а также файлы миниатюр, '
+        'потерянные key-value хранилищем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=200,
+            help='Операций с диском в секунду, 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        throttle = media_gc.Throttle(options['rate'])
+        root = settings.MEDIA_ROOT
+        storage = Post._meta.get_field('image').storage
+        directory = Post._meta.get_field('image').upload_to.rstrip('/')
+
+        images = 0
+        for name in media_gc.orphan_images(
+            root, directory, options['min_age'], throttle
+        ):
+            images += 1
+            self.report(name, dry_run)
+            if not dry_run:
+                throttle()
+                storage.delete(name)
+                media_gc.delete_source(name)
+
+        sources = 0
+        for source in media_gc.orphan_sources():
+            sources += 1
+            self.report(f'{source.name} (миниатюры)', dry_run)
+            if not dry_run:
+                throttle()
+                media_gc.delete_source(source)
+
+        thumbnails = 0
+        for name in media_gc.orphan_thumbnails(
+            root, options['min_age'], throttle
+        ):
+            thumbnails += 1
+            self.report(name, dry_run)
+            if not dry_run:
+                throttle()
+                default.storage.delete(name)
+
+        verb = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: картинок {images}, миниатюр удалённых картинок '
+            f'{sources}, потерянных миниатюр {thumbnails}'
+        ))
+
+    def report(self, name, dry_run):
+        if dry_run or self.verbosity > 1:
+            self.stdout.write(name)
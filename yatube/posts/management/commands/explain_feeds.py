@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.models import Comment, Post, TimelineEntry
+
+FULL_SCAN = 'SCAN'
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def feed_querysets():
+    """Запросы лент в том виде, в каком их выполняют представления."""
+    limit = settings.PAGINATION_NUMBER
+    return {
+        'index': Post.objects.with_feed_relations()[:limit],
+        'group_posts': Post.objects.with_feed_relations().filter(
+            group_id=0
+        )[:limit],
+        'profile': Post.objects.with_feed_relations().filter(
+            author_id=0
+        )[:limit],
+        'follow_index': TimelineEntry.objects.filter(
+            user_id=0
+        ).order_by('-pub_date', '-post_id')[:limit],
+        'post_comments': Comment.objects.for_post(0).with_author(),
+    }
+
+
+def plan_problems(plan):
+    problems = []
+    for detail in plan:
+        if detail.startswith(FULL_SCAN) and 'USING' not in detail:
+            problems.append(f'полный проход: {detail}')
+        elif detail.startswith(TEMP_SORT):
+            problems.append(f'сортировка во временном B-tree: {detail}')
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN для запросов лент и завершается '
+        'с ошибкой, если запрос сканирует таблицу целиком или сортирует '
+        'во временном B-tree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'feeds', nargs='*',
+            help='Проверить только перечисленные ленты.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        querysets = feed_querysets()
+        names = options['feeds'] or list(querysets)
+        unknown = set(names) - set(querysets)
+        if unknown:
+            raise CommandError(
+                'Неизвестные ленты: ' + ', '.join(sorted(unknown))
+            )
+        failed = []
+        for name in names:
+            queryset = querysets[name]
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            problems = plan_problems(plan)
+            style = self.style.ERROR if problems else self.style.SUCCESS
+            self.stdout.write(style(name))
+            for detail in plan:
+                self.stdout.write(f'    {detail}')
+            if problems:
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Неэффективные планы запросов: ' + ', '.join(failed)
+            )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import sharding
+from posts.images import fill_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, формат, размер файла и хеш картинок '
+        'у постов, загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перечитать картинки всех постов, а не только пустые.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        if not options['all']:
+            posts = posts.filter(image_hash='')
+        filled = missing = 0
+        for shard_posts in sharding.querysets(posts):
+            for post in shard_posts.iterator():
+                try:
+                    values = fill_metadata(post)
+                except (OSError, ValueError) as error:
+                    missing += 1
+                    self.stderr.write(f'{post.image.name}: {error}')
+                    continue
+                # update() не вызывает сигналы и не трогает остальные поля.
+                shard_posts.filter(pk=post.pk).update(**values)
+                filled += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {filled}, не удалось прочитать: {missing}'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.middleware import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кэша страниц по маршрутам, '
+        'сложенные по всем процессам (core.metrics).'
+    )
+
+    def handle(self, *args, **options):
+        for name, stats in page_cache_stats().items():
+            requests = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / requests if requests else 0
+            self.stdout.write(
+                f'{name:<12} hits={stats["hits"]:<8} '
+                f'misses={stats["misses"]:<8} hit_ratio={ratio:.2%}'
+            )
@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import sharding
+from posts.models import Post
+from posts.thumbnails import pregenerate
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры для уже загруженных картинок постов '
+        'в нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        rows = sorted({
+            row
+            for queryset in sharding.querysets(Post.objects.exclude(image=''))
+            for row in queryset.values_list(
+                'image', 'image_width', 'image_height'
+            ).distinct()
+        }, key=lambda row: row[0])
+        names = [name for name, _, _ in rows]
+        sizes = [
+            (width, height) if width and height else None
+            for _, width, height in rows
+        ]
+        # Дочерние процессы откроют собственные соединения с базой.
+        connections.close_all()
+        created = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for count in pool.map(
+                pregenerate, names, sizes, chunksize=options['chunk_size']
+            ):
+                created += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, миниатюр готово: {created}'
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from core.storage import is_sharded
+from posts import feed_cache, sharding, thumbnails
+from posts.models import Post
+from posts.signals import post_scopes
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки, загруженные до хранилища по хешу '
+        'содержимого, в каталоги posts/ab/cd/ и объединяет дубликаты.'
+    )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        # Список целиком: строки постов обновляются по ходу обхода.
+        names = sorted({
+            name
+            for queryset in sharding.querysets(Post.objects.exclude(image=''))
+            for name in queryset.values_list('image', flat=True).distinct()
+        })
+        moved = missing = 0
+        for name in names:
+            if is_sharded(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла {name}')
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            posts = []
+            for queryset in sharding.querysets(Post.objects.all()):
+                posts.extend(sharding.related(
+                    queryset.filter(image=name), 'author'
+                ))
+                # update() не вызывает сигналов: кэшированные страницы и
+                # ETag сменятся только после смены поколений лент.
+                queryset.filter(image=name).update(image=new_name)
+            for post in posts:
+                feed_cache.bump(*post_scopes(post, (post.group_id,)))
+            storage.delete(name)
+            if posts:
+                posts[0].image.name = new_name
+                thumbnails.schedule(posts[0])
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, нет файла: {missing}'
+        ))
@@ -0,0 +1,210 @@
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+from PIL import Image
+
+from posts import counters, images, sharding, thumbnails, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+PASSWORD = 'bench-password'
+IMAGE_SIZE = (1200, 800)
+DAYS = 365
+
+# Объекты только создаются в памяти, в базу их пишет bulk_create.
+mixer = Mixer(commit=False)
+
+
+def batches(count):
+    for start in range(0, count, BATCH_SIZE):
+        yield min(BATCH_SIZE, count - start)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных тестов '
+        '(bench_posts): пользователи, группы, посты, комментарии, подписки '
+        'и картинки. Пишет пакетами через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 200),
+            ('groups', 10),
+            ('posts', 5000),
+            ('comments', 10000),
+            ('follows', 2000),
+            ('images', 10),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default}).',
+            )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.3,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковые данные при повторном запуске.',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if sharding.enabled():
+            # bulk_create выдаёт id подряд, а не по номеру шарда.
+            raise CommandError('seed_bench не поддерживает POST_SHARDS')
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        mixer.faker.seed(options['seed'])
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        pictures = self.create_images(options['images'])
+        posts = self.create_posts(
+            options['posts'], users, groups, pictures, options['image_ratio']
+        )
+        comments = self.create_comments(options['comments'], users, posts)
+        follows = self.create_follows(options['follows'], users)
+
+        # bulk_create не вызывает сигналы: счётчики, ленты подписок и
+        # кэш лент собираются заново.
+        counters.repair()
+        entries = timeline.rebuild()
+        cache.clear()
+        for picture in pictures:
+            thumbnails.pregenerate(
+                picture['image'],
+                (picture['image_width'], picture['image_height']),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} польз., {len(groups)} групп, '
+            f'{len(posts)} постов, {comments} комм., '
+            f'{follows} подписок, {len(pictures)} картинок, '
+            f'{entries} записей лент. Пароль пользователей: {PASSWORD}'
+        ))
+
+    def new_pks(self, model, last_pk):
+        return list(model.objects.filter(pk__gt=last_pk).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def create_users(self, count):
+        last_pk = self.last_pk(User)
+        usernames = (f'bench{last_pk}_{number}' for number in range(count))
+        # Хеш пароля считается один раз: make_password на каждого
+        # пользователя занял бы больше времени, чем вся вставка.
+        password = make_password(PASSWORD)
+        for size in batches(count):
+            User.objects.bulk_create(mixer.cycle(size).blend(
+                User,
+                username=usernames,
+                password=password,
+                is_staff=False,
+                is_superuser=False,
+                is_active=True,
+            ))
+        return self.new_pks(User, last_pk)
+
+    def create_groups(self, count):
+        last_pk = self.last_pk(Group)
+        Group.objects.bulk_create(mixer.cycle(count).blend(
+            Group,
+            slug=(f'bench{last_pk}-{number}' for number in range(count)),
+        ))
+        return self.new_pks(Group, last_pk)
+
+    def create_images(self, count):
+        """Файлы картинок и значения полей ``Post.image*`` для них."""
+        storage = Post._meta.get_field('image').storage
+        pictures = []
+        for number in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+            metadata = images.read_metadata(buffer)
+            name = storage.save(
+                f'posts/bench{number}.jpg', ContentFile(buffer.getvalue())
+            )
+            pictures.append({'image': name, **metadata})
+        return pictures
+
+    def create_posts(self, count, users, groups, pictures, image_ratio):
+        last_pk = self.last_pk(Post)
+        for size in batches(count):
+            posts = []
+            for _ in range(size):
+                values = {}
+                if pictures and self.random.random() < image_ratio:
+                    values = self.random.choice(pictures)
+                posts.append(Post(
+                    text=self.faker.paragraph(nb_sentences=5),
+                    author_id=self.random.choice(users),
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.5 else None
+                    ),
+                    **values,
+                ))
+            Post.objects.bulk_create(posts)
+        pks = self.new_pks(Post, last_pk)
+        # pub_date с auto_now_add при вставке получает текущее время:
+        # даты разносятся на год назад по возрастанию id.
+        now = timezone.now()
+        offsets = sorted(
+            (self.random.uniform(0, DAYS) for _ in pks), reverse=True
+        )
+        Post.objects.bulk_update(
+            [
+                Post(pk=pk, pub_date=now - timedelta(days=offset))
+                for pk, offset in zip(pks, offsets)
+            ],
+            ['pub_date'],
+            batch_size=BATCH_SIZE,
+        )
+        return pks
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return 0
+        for size in batches(count):
+            Comment.objects.bulk_create([
+                Comment(
+                    post_id=self.random.choice(posts),
+                    author_id=self.random.choice(users),
+                    text=self.faker.sentence(),
+                )
+                for _ in range(size)
+            ])
+        return count
+
+    def create_follows(self, count, users):
+        """Случайные подписки; повторные пары пропускаются."""
+        if len(users) < 2:
+            return 0
+        before = Follow.objects.count()
+        for size in batches(count):
+            follows = []
+            for _ in range(size):
+                user, author = self.random.sample(users, 2)
+                follows.append(Follow(user_id=user, author_id=author))
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return Follow.objects.count() - before
@@ -0,0 +1,174 @@
+"""Поиск и удаление картинок и миниатюр, на которые не ссылаются посты.
+
+Все проходы потоковые: файлы каталога ``posts/`` обходятся в
+лексикографическом порядке и сливаются с отсортированным запросом
+``Post.image``, записи key-value хранилища sorl-thumbnail и файлы
+``cache/`` проверяются пачками. В памяти держится один каталог и одна
+пачка, сколько бы файлов ни было на диске.
+"""
+import heapq
+import os
+import time
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import sharding
+from .models import Post
+
+BATCH_SIZE = 500
+
+
+class Throttle:
+    """Не больше ``rate`` операций с диском в секунду; 0 — без ограничения."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = time.monotonic()
+
+    def __call__(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def walk_sorted(root, directory, throttle):
+    """Имена файлов под ``directory`` в порядке сравнения строк.
+
+    Каталог сортируется как ``имя/``, поэтому обход в глубину выдаёт
+    пути в том же порядке, что и ``ORDER BY`` в базе.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(root, directory)))
+    except FileNotFoundError:
+        return
+    entries.sort(
+        key=lambda entry: entry.name + ('/' if entry.is_dir() else '')
+    )
+    for entry in entries:
+        throttle()
+        name = f'{directory}/{entry.name}' if directory else entry.name
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_sorted(root, name, throttle)
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry.stat().st_mtime
+
+
+def live_images():
+    # Имена из нескольких шардов могут повторяться: unreferenced() это
+    # не мешает.
+    return heapq.merge(*(
+        queryset.iterator() for queryset in sharding.querysets(
+            Post.objects.exclude(image='').order_by('image').values_list(
+                'image', flat=True
+            ).distinct()
+        )
+    ))
+
+
+def unreferenced(files, references):
+    """Файлы из ``files``, которых нет среди ``references``.
+
+    Оба итератора отсортированы по имени.
+    """
+    reference = next(references, None)
+    for name, mtime in files:
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name, mtime
+
+
+def _older_than(files, min_age):
+    # Свежий файл мог быть загружен для ещё не сохранённого поста, а
+    # миниатюра попадает в хранилище только после записи файла.
+    deadline = time.time() - min_age
+    return ((name, mtime) for name, mtime in files if mtime < deadline)
+
+
+def orphan_images(root, directory, min_age, throttle):
+    """Оригиналы картинок в ``directory``, не нужные ни одному посту."""
+    files = _older_than(walk_sorted(root, directory, throttle), min_age)
+    for name, _ in unreferenced(files, live_images()):
+        yield name
+
+
+def _batches(iterable):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _kvstore_rows(prefix):
+    """Строки хранилища sorl-thumbnail с ключами ``prefix*`` пачками.
+
+    Пачки выбираются по ключу после последнего прочитанного, поэтому
+    удаление строк по ходу обхода ничего не пропускает.
+    """
+    last = ''
+    while True:
+        rows = list(
+            KVStore.objects.filter(key__startswith=prefix, key__gt=last)
+            .order_by('key').values_list('key', 'value')[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def orphan_sources():
+    """Записи оригиналов в key-value хранилище без живых постов."""
+    thumbnail_prefix = thumbnail_settings.THUMBNAIL_PREFIX
+    for rows in _kvstore_rows(add_prefix('')):
+        sources = [
+            deserialize_image_file(value) for _, value in rows
+        ]
+        sources = [
+            source for source in sources
+            if not source.name.startswith(thumbnail_prefix)
+        ]
+        live = set()
+        for queryset in sharding.querysets(Post.objects.filter(
+            image__in=[source.name for source in sources]
+        )):
+            live.update(queryset.values_list('image', flat=True))
+        for source in sources:
+            if source.name not in live:
+                yield source
+
+
+def orphan_thumbnails(root, min_age, throttle):
+    """Файлы миниатюр, о которых не знает key-value хранилище."""
+    directory = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+    files = _older_than(walk_sorted(root, directory, throttle), min_age)
+    for batch in _batches(name for name, _ in files):
+        keys = {
+            add_prefix(ImageFile(name, default.storage).key): name
+            for name in batch
+        }
+        known = set(KVStore.objects.filter(
+            key__in=list(keys)
+        ).values_list('key', flat=True))
+        for key, name in keys.items():
+            if key not in known:
+                yield name
+
+
+def delete_source(source):
+    """Удаляет миниатюры оригинала и его записи в хранилище."""
+    if isinstance(source, str):
+        source = ImageFile(source, default.storage)
+    default.kvstore.delete(source, delete_thumbnails=True)
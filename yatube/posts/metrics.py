@@ -0,0 +1,18 @@
+"""Метрики приложения posts, выдаются эндпоинтом ``/metrics``."""
+from core.metrics import Counter, Histogram
+
+THUMBNAIL_DURATION = Histogram(
+    'yatube_thumbnail_generation_seconds',
+    'Время создания одной миниатюры картинки поста.',
+    ['format'],
+)
+CREATED = Counter(
+    'yatube_created',
+    'Созданные посты, комментарии и подписки.',
+    ['model'],
+)
+PAGE_CACHE_REQUESTS = Counter(
+    'yatube_page_cache_requests',
+    'Ответы кэша страниц для анонимных читателей по маршрутам.',
+    ['route', 'result'],
+)
@@ -0,0 +1,103 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from . import feed_cache, metrics
+
+HITS = 'hits'
+MISSES = 'misses'
+SESSION_COOKIE = settings.SESSION_COOKIE_NAME
+ROUTES = ('index', 'group_list', 'profile', 'post_detail', 'post_comments')
+
+
+def _count(result, url_name):
+    # Счётчик в памяти процесса (core.metrics): запись в кэш на каждом
+    # попадании брала бы блокировку записи SQLite-кэша.
+    metrics.PAGE_CACHE_REQUESTS.inc(route=url_name, result=result)
+
+
+def page_cache_stats():
+    """Попадания и промахи кэша страниц всех процессов по маршрутам."""
+    totals = metrics.PAGE_CACHE_REQUESTS.totals()
+    return {
+        name: {
+            result: int(totals.get((name, result), 0))
+            for result in (HITS, MISSES)
+        }
+        for name in ROUTES
+    }
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэширует готовые страницы лент и постов для анонимных читателей.
+
+    Ответ отдаётся до вызова представления и шаблонов. Ключ страницы
+    включает поколения лент из ``feed_cache``, поэтому сигналы моделей,
+    инвалидирующие фрагменты, инвалидируют и страницы. Ответы, которые
+    ставят cookie CSRF или сессии, не кэшируются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key, url_name = self._lookup(request)
+        if key is None:
+            return self.get_response(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(HITS, url_name)
+            return self._restore(cached)
+        _count(MISSES, url_name)
+        response = self.get_response(request)
+        if self._cacheable(request, response):
+            cache.set(key, self._freeze(response),
+                      settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def _lookup(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None, None
+        if SESSION_COOKIE in request.COOKIES:
+            return None, None
+        if request.user.is_authenticated:
+            return None, None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None, None
+        scopes = feed_cache.route_scopes(match)
+        if scopes is None:
+            return None, None
+        generations = feed_cache.generations(*scopes)
+        source = '|'.join([
+            request.get_full_path(), *(str(value) for value in generations)
+        ])
+        digest = hashlib.md5(source.encode()).hexdigest()
+        return f'pagecache:{match.url_name}:{digest}', match.url_name
+
+    @staticmethod
+    def _cacheable(request, response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+            return False
+        session = getattr(request, 'session', None)
+        if session is not None and session.modified:
+            return False
+        return not request.user.is_authenticated
+
+    @staticmethod
+    def _freeze(response):
+        return response.content, response.status_code, list(response.items())
+
+    @staticmethod
+    def _restore(cached):
+        content, status, headers = cached
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        return response
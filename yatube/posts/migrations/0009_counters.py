@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    stats = {}
+
+    def add(rows, field):
+        for user_id, total in rows:
+            stats.setdefault(user_id, UserStats(user_id=user_id))
+            setattr(stats[user_id], field, total)
+
+    def totals(model, field):
+        return model.objects.values_list(field).annotate(
+            total=models.Count('pk')
+        ).order_by()
+
+    add(totals(Post, 'author'), 'posts_count')
+    add(totals(Follow, 'author'), 'followers_count')
+    add(totals(Follow, 'user'), 'following_count')
+    UserStats.objects.bulk_create(stats.values(), batch_size=500)
+    for post_id, total in totals(Comment, 'post'):
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_auto_20261017_0556'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'user stats',
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
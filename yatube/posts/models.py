@@ -1,9 +1,28 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from core.storage import ContentAddressedStorage
+
+from . import sharding
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def with_feed_relations(self):
+        """Всё, что читает ``includes/mainpost.html``, одним запросом
+        (с шардами — тремя)."""
+        return sharding.related(self, 'author', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def with_author(self):
+        return sharding.related(self, 'author')
+
+    def for_post(self, post_id):
+        return self.filter(post_id=post_id).order_by('created', 'id')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -23,20 +42,58 @@ class Post(models.Model):
         related_name='posts',
         help_text='Группа, к которой будет относиться пост'
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются при загрузке картинки (posts.images), чтобы шаблонам
+    # и миниатюрам не приходилось открывать файл.
+    image_width = models.PositiveIntegerField(
+        blank=True, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        blank=True, null=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        blank=True, null=True, editable=False
+    )
+    image_format = models.CharField(max_length=10, blank=True, editable=False)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'post'
         verbose_name_plural = 'user_posts'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        if not sharding.enabled() or not self._state.adding:
+            return super().save(*args, **kwargs)
+        # create() передаёт базу менеджера, а пост живёт в шарде автора.
+        kwargs['using'] = using = sharding.home(self)
+        with transaction.atomic(using=using):
+            if self.pk is None:
+                # Номер шарда зашит в id: по id пост ищется в одной базе.
+                self.pk = sharding.next_post_id(Post, using)
+                kwargs['force_insert'] = True
+            return super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -64,6 +121,20 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if sharding.enabled() and self._state.adding:
+            kwargs['using'] = sharding.home(self)
+        return super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -79,8 +150,106 @@ class Follow(models.Model):
 
     class Meta:
         ordering = ('author',)
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'user'], name='unique_follow'
             )
         ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'user stats'
+        verbose_name_plural = 'user stats'
+
+    def __str__(self) -> str:
+        return f'stats of {self.user_id}'
+
+    @classmethod
+    def of(cls, user):
+        """Счётчики пользователя; нулевые, если строки ещё нет."""
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'timeline entry'
+        verbose_name_plural = 'timeline entries'
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+
+
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchTextField(models.TextField):
+    """Колонка полнотекстового индекса: ``text__match=<запрос FTS5>``."""
+
+
+SearchTextField.register_lookup(Match)
+
+
+class PostSearch(models.Model):
+    """Индекс FTS5 по ``Post.text`` (таблица ``posts_post_fts``).
+
+    Таблица создана миграцией и синхронизируется триггерами на
+    ``posts_post``. ``rank`` — оценка bm25: чем меньше, тем релевантнее.
+    """
+    post = models.OneToOneField(
+        'Post',
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='+'
+    )
+    text = SearchTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
@@ -0,0 +1,133 @@
+"""Полнотекстовый поиск по постам через индекс FTS5 ``posts_post_fts``.
+
+Индекс хранит только токены (``content='posts_post'``), текст читается из
+самой таблицы постов. Запрос читателя не передаётся в FTS5 как есть:
+каждое слово берётся в кавычки, поэтому операторы и скобки не ломают
+синтаксис, а ``слово*`` остаётся поиском по префиксу.
+
+С шардами постов (``posts.sharding``) у каждого шарда свой индекс, а
+результаты сливаются по ``rank``.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import sharding
+from .models import Group, PostSearch, User
+
+# Маркеры совпадений в snippet(): после экранирования текста поста они
+# заменяются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 24
+
+# Те же триггеры, что создаёт миграция 0011_post_search. Миграции SQLite,
+# пересоздающие posts_post, удаляют триггеры вместе со старой таблицей,
+# поэтому после migrate они создаются заново.
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert "
+    "AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete "
+    "AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_update "
+    "AFTER UPDATE OF text ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text); "
+    "END",
+]
+
+
+def install_triggers(using='default'):
+    connection = connections[using]
+    table = PostSearch._meta.db_table
+    if table not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+
+
+def build_query(text):
+    """Запрос FTS5 из слов читателя или ``None``, если слов нет."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.strip('*"')
+        if not word:
+            continue
+        term = '"%s"' % word.replace('"', '""')
+        terms.append(term + '*' if prefix else term)
+    return ' '.join(terms) or None
+
+
+def search_posts(text, group=None, author=None, date_from=None,
+                 date_to=None):
+    """Найденные посты по релевантности: строки ``PostSearch``.
+
+    У каждой строки есть ``snippet`` — фрагмент текста с маркерами
+    совпадений, и ``post`` с автором и группой.
+    """
+    query = build_query(text)
+    if query is None:
+        return PostSearch.objects.none()
+    results = PostSearch.objects.filter(text__match=query).annotate(
+        snippet=RawSQL(
+            f'snippet({PostSearch._meta.db_table}, 0, %s, %s, %s, %s)',
+            (MARK_START, MARK_END, '…', SNIPPET_TOKENS),
+        )
+    ).defer('text')
+    results = sharding.related(results, 'post__author', 'post__group')
+    if sharding.enabled():
+        # Группы и пользователи в другой базе: фильтр по их id.
+        if group:
+            results = results.filter(post__group__in=list(
+                Group.objects.filter(slug=group).values_list('pk', flat=True)
+            ))
+        if author:
+            results = results.filter(post__author__in=list(
+                User.objects.filter(username=author)
+                .values_list('pk', flat=True)
+            ))
+    else:
+        if group:
+            results = results.filter(post__group__slug=group)
+        if author:
+            results = results.filter(post__author__username=author)
+    if date_from:
+        results = results.filter(post__pub_date__date__gte=date_from)
+    if date_to:
+        results = results.filter(post__pub_date__date__lte=date_to)
+    return sharding.merged(results)
+
+
+def matching_post_ids(text):
+    """Подзапрос с id постов, подходящих под запрос, для ``pk__in``."""
+    query = build_query(text)
+    if query is None:
+        return PostSearch.objects.none().values('post_id')
+    return PostSearch.objects.filter(text__match=query).values('post_id')
+
+
+def highlight(snippet):
+    """Экранированный фрагмент, в котором совпадения выделены <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def to_posts(rows):
+    """Посты для шаблона: у каждого есть ``snippet`` с подсветкой."""
+    posts = []
+    for row in rows:
+        row.post.snippet = highlight(row.snippet)
+        posts.append(row.post)
+    return posts
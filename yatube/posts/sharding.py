@@ -0,0 +1,253 @@
+"""Посты и комментарии в нескольких базах SQLite по автору.
+
+Включается списком псевдонимов баз ``POST_SHARDS``; пустой список — все
+посты в ``default``, модуль ничего не меняет.
+
+* Пост лежит в шарде ``author_id % len(POST_SHARDS)``, комментарии и
+  индекс поиска ``posts_post_fts`` — в шарде поста. Пользователи,
+  группы, подписки и счётчики остаются в ``default``.
+* Остаток от деления id поста на число шардов — номер его шарда, поэтому
+  ``post_detail``, комментарии и правка поста читают одну базу. Id
+  выдаёт ``Post.save`` в транзакции шарда: ``BEGIN IMMEDIATE`` бэкенда
+  ``core.db_backends.sqlite3`` не даёт двум процессам взять один номер.
+  Поэтому шарды включаются на пустой таблице постов.
+* Ленты из всех шардов (``index``, группа, подписки, поиск) —
+  ``MergedQuerySet``: каждый шард отдаёт начало страницы в одном порядке,
+  строки сливаются ``heapq.merge``.
+* JOIN между файлами невозможен: автор и группа постов читаются
+  отдельным запросом к ``default`` (``related``), а в шардах с
+  ``PRAGMA foreign_keys = off`` внешние ключи не проверяются.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Max, prefetch_related_objects
+
+SHARDED_MODELS = {'posts.post', 'posts.comment', 'posts.postsearch'}
+
+
+def shards():
+    return list(getattr(settings, 'POST_SHARDS', ()))
+
+
+def enabled():
+    return bool(shards())
+
+
+def shard_for_author(author_id):
+    aliases = shards()
+    return aliases[author_id % len(aliases)]
+
+
+def shard_for_post(post_id):
+    aliases = shards()
+    return aliases[int(post_id) % len(aliases)]
+
+
+def next_post_id(model, using):
+    """Следующий id поста в шарде ``using``.
+
+    Вызывается внутри транзакции шарда, иначе два процесса получат один
+    и тот же номер.
+    """
+    aliases = shards()
+    last = model._base_manager.using(using).aggregate(
+        last=Max('pk')
+    )['last'] or 0
+    return last + 1 + (aliases.index(using) - last - 1) % len(aliases)
+
+
+def for_post(queryset, post_id):
+    """Запрос к шарду поста: постов, комментариев или индекса поиска;
+    без шардов — как есть."""
+    if not enabled():
+        return queryset
+    return queryset.using(shard_for_post(post_id))
+
+
+def querysets(queryset):
+    """Тот же запрос к каждому шарду."""
+    if not enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in shards()]
+
+
+def merged(queryset):
+    """Запрос ко всем шардам как к одной упорядоченной выборке."""
+    if not enabled():
+        return queryset
+    return MergedQuerySet(querysets(queryset))
+
+
+def related(queryset, *fields):
+    """``select_related`` или, если связи лежат в другой базе,
+    ``prefetch_related``."""
+    if not enabled():
+        return queryset.select_related(*fields)
+    return queryset.prefetch_related(*fields)
+
+
+def home(instance):
+    """Шард нового поста, комментария или строки индекса поиска."""
+    if instance._meta.label_lower == 'posts.post':
+        if instance.author_id is None:
+            return None
+        return shard_for_author(instance.author_id)
+    if instance.post_id is None:
+        return None
+    return shard_for_post(instance.post_id)
+
+
+def _is_sharded(model_or_instance):
+    return model_or_instance._meta.label_lower in SHARDED_MODELS
+
+
+class MergedQuerySet:
+    """Один запрос к нескольким шардам.
+
+    Поддерживает то, что нужно пагинаторам: ``filter``, ``exclude``,
+    ``order_by``, ``count`` и срезы. Срез ``[start:stop]`` читает первые
+    ``stop`` строк каждого шарда, поэтому глубокие страницы дороже, чем
+    с курсором. ``prefetch_related`` выполняется для объединённой
+    страницы: связи с постами — по запросу на шард, остальные — одним
+    запросом.
+    """
+
+    ordered = True
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+
+    @property
+    def model(self):
+        return self.querysets[0].model
+
+    def _chain(self, method, *args, **kwargs):
+        return MergedQuerySet([
+            getattr(queryset, method)(*args, **kwargs)
+            for queryset in self.querysets
+        ])
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def order_by(self, *fields):
+        return self._chain('order_by', *fields)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def _ordering(self):
+        query = self.querysets[0].query
+        ordering = list(query.order_by or self.model._meta.ordering)
+        if not ordering:
+            return [], False
+        descending = ordering[0].startswith('-')
+        if any(field.startswith('-') != descending for field in ordering):
+            raise ValueError(
+                'Сортировка по шардам только в одном направлении'
+            )
+        return [field.lstrip('-') for field in ordering], descending
+
+    def _rows(self, limit=None):
+        fields, descending = self._ordering()
+        lookups = self.querysets[0]._prefetch_related_lookups
+        parts = []
+        for queryset in self.querysets:
+            queryset = queryset.prefetch_related(None)
+            parts.append(queryset if limit is None else queryset[:limit])
+        rows = heapq.merge(
+            *parts, reverse=descending,
+            key=lambda row: [getattr(row, field) for field in fields],
+        )
+        return rows, lookups
+
+    def _prefetch(self, rows, lookups):
+        in_shard = [
+            lookup for lookup in lookups
+            if _is_sharded(self.model._meta.get_field(
+                lookup.split('__')[0]
+            ).related_model)
+        ]
+        shared = [lookup for lookup in lookups if lookup not in in_shard]
+        if shared:
+            prefetch_related_objects(rows, *shared)
+        if in_shard:
+            by_shard = defaultdict(list)
+            for row in rows:
+                by_shard[row._state.db].append(row)
+            for shard_rows in by_shard.values():
+                prefetch_related_objects(shard_rows, *in_shard)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return list(self[index:index + 1])[0]
+        start, stop = index.start or 0, index.stop
+        rows, lookups = self._rows(stop)
+        rows = list(islice(rows, start, stop))
+        self._prefetch(rows, lookups)
+        return rows
+
+    def __iter__(self):
+        rows, lookups = self._rows()
+        if not lookups:
+            return rows
+        rows = list(rows)
+        self._prefetch(rows, lookups)
+        return iter(rows)
+
+    def __len__(self):
+        return self.count()
+
+
+class AuthorShardRouter:
+    """Отправляет посты, комментарии и индекс поиска в шард автора.
+
+    Запросы, для которых шард не определить, маршрутизатор пропускает:
+    их решают следующие (``core.routers.ReadReplicaRouter``). Код, которому
+    нужен конкретный шард, выбирает его сам через ``for_post``,
+    ``querysets`` и ``merged``.
+    """
+
+    def _route(self, model, instance):
+        if instance is None or not enabled() or not _is_sharded(model):
+            return None
+        if _is_sharded(instance):
+            if instance._state.adding:
+                return home(instance)
+            return instance._state.db
+        if (
+            model._meta.label_lower == 'posts.post'
+            and isinstance(instance, get_user_model())
+        ):
+            # author.posts
+            return shard_for_author(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if enabled() and (
+            _is_sharded(obj1) or _is_sharded(obj2)
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема шардов — полная копия основной, лишние таблицы пусты.
+        if db in shards():
+            return True
+        return None
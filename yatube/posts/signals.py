@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import (counters, feed_cache, images, search, sharding, thumbnails,
+               timeline)
+from .metrics import CREATED
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def post_scopes(post, group_ids=()):
+    """Ленты, в которых показывается пост."""
+    scopes = [('index',), ('post', post.pk)]
+    scopes.append(('profile', post.author.username))
+    slugs = Group.objects.filter(
+        pk__in={group_id for group_id in group_ids if group_id}
+    ).values_list('slug', flat=True)
+    scopes.extend(('group', slug) for slug in slugs)
+    return scopes
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    previous = None
+    if instance.pk and not instance._state.adding:
+        previous = sharding.for_post(
+            Post.objects, instance.pk
+        ).filter(pk=instance.pk).values_list(
+            'group_id', 'image'
+        ).first()
+    instance._previous_group_id, instance._previous_image = (
+        previous or (None, None)
+    )
+    image = instance.image
+    if not image._committed:
+        images.fill_metadata(instance)
+    elif image.name != instance._previous_image:
+        # Уже сохранённый файл не открываем в запросе: метаданные
+        # заполнит команда fill_image_metadata.
+        images.clear_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        CREATED.inc(model='post')
+        counters.increment(instance.author_id, 'posts_count')
+        timeline.fan_out(instance)
+    if instance.image.name != getattr(instance, '_previous_image', None):
+        thumbnails.schedule(instance)
+    feed_cache.bump(*post_scopes(instance, (
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    )))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'posts_count')
+    feed_cache.bump(*post_scopes(instance, (instance.group_id,)))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        CREATED.inc(model='comment')
+        counters.change_comments_count(instance.post_id, 1)
+    feed_cache.bump(('post', instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    feed_cache.bump(('post', instance.post_id))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, using, **kwargs):
+    # Каскадное удаление Django видит только базу пользователя.
+    for alias in sharding.shards():
+        if alias != using:
+            Comment.objects.using(alias).filter(author=instance).delete()
+            Post.objects.using(alias).filter(author=instance).delete()
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, using, **kwargs):
+    for alias in sharding.shards():
+        if alias != using:
+            Post.objects.using(alias).filter(group=instance).update(
+                group=None
+            )
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Ссылки на группу есть во всех лентах: профили и подписки зависят от
+    # общей ленты ('groups',), а не от каждой группы в отдельности.
+    scopes = [('index',), ('groups',), ('group', instance.slug)]
+    previous = getattr(instance, '_previous_slug', None)
+    if previous and previous != instance.slug:
+        scopes.append(('group', previous))
+    feed_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        CREATED.inc(model='follow')
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+    feed_cache.bump(('follow', instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'followers_count')
+    counters.decrement(instance.user_id, 'following_count')
+    timeline.remove(instance.user_id, instance.author_id)
+    timeline.rebalance(instance.author_id)
+    feed_cache.bump(('follow', instance.user_id))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install_triggers(using)
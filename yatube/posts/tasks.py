@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from jobs.queue import task
+
+from . import counters, feed_cache, sharding, thumbnails
+from .models import Post
+from .signals import post_scopes
+
+
+@task(name='posts.generate_thumbnails', max_attempts=3)
+def generate_thumbnails(name, width=None, height=None):
+    size = (width, height) if width and height else None
+    if thumbnails.pregenerate(name, size) < len(thumbnails.variants()):
+        raise RuntimeError(f'Не все миниатюры {name} созданы')
+    # Страницы с постом закэшированы со ссылкой на оригинал: сигнал
+    # сохранения сменил поколения лент до появления миниатюр.
+    for posts in sharding.querysets(Post.objects.filter(image=name)):
+        for post in sharding.related(posts, 'author'):
+            feed_cache.bump(*post_scopes(post, (post.group_id,)))
+
+
+@task(name='posts.repair_counters', every=timedelta(days=1))
+def repair_counters():
+    counters.repair()
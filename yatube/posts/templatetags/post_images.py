@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(image):
+    """Готовые миниатюры картинки поста или ``None``, пока их нет."""
+    return picture(image)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import Budget, BudgetTestMixin
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+# Холодный кэш, данные seed_bench ниже. Время — с большим запасом для
+# медленных машин CI: оно ловит лишь грубые регрессии, точные замеры
+# делает bench_posts.
+BUDGETS = {
+    'index': Budget(queries=2, cache_misses=3, time_ms=1000),
+    'group_list': Budget(queries=3, cache_misses=3, time_ms=1000),
+    'profile': Budget(queries=3, cache_misses=4, time_ms=1000),
+    'post_detail': Budget(queries=2, cache_misses=2, time_ms=1000),
+    'post_comments': Budget(queries=1, cache_misses=1, time_ms=1000),
+    'search': Budget(queries=1, cache_misses=0, time_ms=1000),
+    'follow_index': Budget(queries=5, cache_misses=3, time_ms=1000),
+    'post_edit': Budget(queries=4, cache_misses=0, time_ms=1000),
+}
+
+
+class PageBudgetTests(BudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_bench', users=20, groups=3, posts=60, comments=80,
+            follows=60, images=0, stdout=StringIO(),
+        )
+        cls.post = Post.objects.annotate(
+            total=Count('comments')
+        ).latest('total')
+        cls.group = Group.objects.annotate(total=Count('posts')).latest(
+            'total'
+        )
+        cls.reader = User.objects.annotate(
+            total=Count('follower')
+        ).latest('total')
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse(
+                'posts:profile', args=[self.post.author.username]
+            ),
+            'post_detail': reverse('posts:post_detail', args=[self.post.pk]),
+            'post_comments': reverse(
+                'posts:post_comments', args=[self.post.pk]
+            ),
+            'search': reverse('posts:search') + '?q=' + (
+                self.post.text.split()[0].strip('.,')
+            ),
+        }
+
+    def test_anonymous_pages_within_budget(self):
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                self.assertWithinBudget(url, BUDGETS[name])
+
+    def test_logged_in_pages_within_budget(self):
+        self.client.force_login(self.reader)
+        self.assertWithinBudget(
+            reverse('posts:follow_index'), BUDGETS['follow_index']
+        )
+        self.client.force_login(self.post.author)
+        self.assertWithinBudget(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            BUDGETS['post_edit'],
+        )
@@ -0,0 +1,153 @@
+import json
+import os
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from core.storage import is_sharded
+from core.testing import TempMediaMixin
+
+from .. import feed_cache
+from ..models import Comment, Post, TimelineEntry
+from ..thumbnails import cached_thumbnail, pregenerate, variants
+from .test_models import SMALL_GIF
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertNotIn('USE TEMP B-TREE', out.getvalue())
+
+
+class RehashImagesCommandTest(TempMediaMixin, TestCase):
+    def test_legacy_images_moved_and_deduplicated(self):
+        author = User.objects.create_user(username='auth')
+        for name in ('one.gif', 'two.gif'):
+            path = os.path.join(self.media_root, 'posts', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'same picture')
+            Post.objects.create(
+                author=author, text=name, image=f'posts/{name}'
+            )
+        generation = feed_cache.generations(('index',))
+        call_command('rehash_images', stdout=StringIO())
+        self.assertNotEqual(feed_cache.generations(('index',)), generation)
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_sharded(name))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, 'posts', 'one.gif'))
+        )
+
+
+class CollectMediaGarbageCommandTest(TempMediaMixin, TestCase):
+    def create_post(self, author, content):
+        post = Post.objects.create(
+            author=author,
+            text='post',
+            image=SimpleUploadedFile(
+                name='small.gif', content=content, content_type='image/gif'
+            ),
+        )
+        pregenerate(post.image.name)
+        return post
+
+    def media_files(self):
+        files = set()
+        for directory, _, names in os.walk(self.media_root):
+            for name in names:
+                path = os.path.join(directory, name)
+                # Файлы старше порога --min-age.
+                os.utime(path, (0, 0))
+                files.add(os.path.relpath(path, self.media_root))
+        return files
+
+    def test_deleted_post_files_collected(self):
+        author = User.objects.create_user(username='auth')
+        kept = self.create_post(author, SMALL_GIF)
+        deleted = self.create_post(
+            author, SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\xFF')
+        )
+        deleted_files = {deleted.image.name} | {
+            cached_thumbnail(deleted.image, variant).name
+            for variant in variants()
+        }
+        deleted.delete()
+        before = self.media_files()
+        self.assertLessEqual(deleted_files, before)
+
+        call_command('collect_media_garbage', '--dry-run', '--rate=0',
+                     stdout=StringIO())
+        self.assertEqual(self.media_files(), before)
+
+        call_command('collect_media_garbage', '--rate=0', stdout=StringIO())
+        after = self.media_files()
+        self.assertEqual(before - after, deleted_files)
+        self.assertIn(kept.image.name, after)
+        self.assertIsNotNone(cached_thumbnail(kept.image, variants()[-1]))
+        self.assertIsNone(cached_thumbnail(deleted.image, variants()[-1]))
+
+
+class BenchCommandsTest(TempMediaMixin, TestCase):
+    def test_seed_and_benchmark(self):
+        call_command(
+            'seed_bench', users=5, groups=2, posts=30, comments=20,
+            follows=8, images=1, image_ratio=0.5, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        author = User.objects.annotate(total=Count('posts')).latest('total')
+        self.assertEqual(author.stats.posts_count, author.total)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+        output = os.path.join(self.media_root, 'bench.json')
+        call_command(
+            'bench_posts', requests=3, warmup=0, output=output,
+            stdout=StringIO(),
+        )
+        with open(output) as file:
+            report = json.load(file)
+        self.assertEqual(report['dataset']['posts'], 30)
+        for name in ('index', 'post_detail', 'follow_index', 'post_edit'):
+            result = report['results'][name]
+            self.assertEqual(result['status'], 200)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+@override_settings(POST_IMAGE_WIDTHS=(320, 640))
+class BenchFeedImagesCommandTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.author, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_widths_taken_from_settings(self):
+        self.create_post()
+        out = StringIO()
+        call_command('bench_feed_images', stdout=out)
+        self.assertIn('Картинок: 1', out.getvalue())
+
+    def test_image_without_thumbnails_skipped(self):
+        post = self.create_post()
+        out, err = StringIO(), StringIO()
+        with mock.patch('posts.thumbnails.pregenerate', return_value=0):
+            call_command('bench_feed_images', stdout=out, stderr=err)
+        self.assertIn(post.image.name, err.getvalue())
+        self.assertNotIn('Картинок', out.getvalue())
@@ -1,22 +1,20 @@
-import shutil
-import tempfile
+import hashlib
 from http import HTTPStatus
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, TestCase
 from django.urls import reverse
 
+from core.storage import sharded_name
+from core.testing import TempMediaMixin
+
 from ..models import Comment, Group, Post
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
-
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostFormTests(TestCase):
+class PostFormTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -42,11 +40,6 @@ class PostFormTests(TestCase):
             text='test-comment',
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def test_create_post(self):
         post_count = Post.objects.count()
         small_gif = (
@@ -82,7 +75,10 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 group_id=self.group.pk,
                 text=form_data['text'],
-                image=f'posts/{uploaded.name}'
+                image=sharded_name(
+                    f'posts/{uploaded.name}',
+                    hashlib.sha256(small_gif).hexdigest(),
+                )
             ).exists()
         )
 
@@ -115,7 +111,9 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), post_count)
         self.assertEqual(post_new.text, form_data['text'])
         self.assertEqual(post_new.group.title, self.group.title)
-        self.assertEqual(post_new.image, f'posts/{uploaded.name}')
+        self.assertEqual(post_new.image, sharded_name(
+            f'posts/{uploaded.name}', hashlib.sha256(small_gif).hexdigest()
+        ))
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
     def test_not_author_of_the_post_cannot_edit_it(self):
@@ -164,7 +162,7 @@ class PostFormTests(TestCase):
             reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
         )
         self.assertEqual(
-            post.context['comments'].last().text, form_data['text']
+            post.context['comments'][-1].text, form_data['text']
         )
 
     def test_guest_user_cannot_comment_on_the_post(self):
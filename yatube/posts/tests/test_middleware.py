@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..middleware import page_cache_stats
+from ..models import Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='test_text')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_served_from_cache(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        before = page_cache_stats()['post_detail']
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertTemplateUsed(first, 'posts/post_detail.html')
+        self.assertTemplateNotUsed(second, 'posts/post_detail.html')
+        self.assertEqual(first.content, second.content)
+        after = page_cache_stats()['post_detail']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_new_post_invalidates_cached_page(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='fresh_post')
+        response = self.client.get(url)
+        self.assertContains(response, 'fresh_post')
+
+    def test_authorized_user_bypasses_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = client.get(url)
+        self.assertTemplateUsed(response, 'posts/index.html')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='test_text')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_unchanged_page_returns_not_modified(self):
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_comment_changes_etag(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'comment'},
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_relogin_changes_etag(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_cached_page_returns_not_modified(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -1,10 +1,27 @@
+import hashlib
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from core.testing import TempMediaMixin
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostModelTest(TestCase):
     @classmethod
@@ -29,3 +46,92 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expexted_object_name = group.title
         self.assertEqual(expexted_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def test_counters_follow_creates_and_deletes(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(UserStats.of(self.author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 1
+        )
+        follow.delete()
+        comment.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 0
+        )
+
+    def test_repair_recomputes_counters(self):
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        ])
+        UserStats.objects.filter(user=self.author).update(posts_count=0)
+        counters.repair()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 4
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).posts_count, 0
+        )
+
+
+class ImageMetadataTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def test_metadata_filled_on_upload(self):
+        post = Post.objects.get(pk=self.create_post().pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertEqual(post.image_format, 'gif')
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(SMALL_GIF).hexdigest()
+        )
+
+    def test_metadata_cleared_with_image(self):
+        post = self.create_post()
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_command_fills_missing_metadata(self):
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_hash=''
+        )
+        call_command('fill_image_metadata', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(SMALL_GIF).hexdigest()
+        )
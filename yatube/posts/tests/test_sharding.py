@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..sharding import AuthorShardRouter, shard_for_author
+
+User = get_user_model()
+
+SHARD = 'posts_shard'
+SHARDS = ['default', SHARD]
+
+
+@override_settings(POST_SHARDS=SHARDS, PAGINATION_NUMBER=4)
+class ShardingTests(TestCase):
+    databases = {'default', SHARD}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[SHARD] = {
+            'ENGINE': 'core.db_backends.sqlite3',
+            'NAME': ':memory:',
+            'OPTIONS': {'PRAGMAS': {'foreign_keys': 'off'}},
+        }
+        with override_settings(POST_SHARDS=SHARDS):
+            cls.shard_name = connections[SHARD].creation.create_test_db(
+                verbosity=0, serialize=False
+            )
+        super().setUpClass()
+        # id идут подряд: один автор в default, другой в шарде.
+        cls.authors = {}
+        for name in ('first', 'second'):
+            author = User.objects.create_user(username=name)
+            cls.authors[shard_for_author(author.pk)] = author
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        start = timezone.now()
+        cls.posts = []
+        for i in range(6):
+            author = cls.authors[SHARDS[i % 2]]
+            post = Post.objects.create(
+                author=author, text=f'Пост {i}',
+                group=cls.group if i < 3 else None,
+            )
+            Post.objects.using(post._state.db).filter(pk=post.pk).update(
+                pub_date=start + timedelta(minutes=i)
+            )
+            cls.posts.append(post)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[SHARD].creation.destroy_test_db(
+            cls.shard_name, verbosity=0
+        )
+        del connections.databases[SHARD]
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, response):
+        return [post.pk for post in response.context['page_obj']]
+
+    def newest_first(self, posts):
+        return [post.pk for post in reversed(posts)]
+
+    def test_posts_stored_in_author_shard(self):
+        for index, alias in enumerate(SHARDS):
+            posts = Post.objects.using(alias).values_list(
+                'author_id', 'pk'
+            )
+            self.assertEqual(len(posts), 3)
+            for author_id, pk in posts:
+                self.assertEqual(self.authors[alias].pk, author_id)
+                self.assertEqual(pk % len(SHARDS), index)
+
+    def test_index_merges_shards_by_pub_date(self):
+        expected = self.newest_first(self.posts)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(self.page(response), expected[:4])
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(self.page(response), expected[4:])
+        self.assertEqual(
+            response.context['page_obj'][0].author.username,
+            self.authors[SHARDS[1]].username,
+        )
+
+    def test_index_cursor_pages_merge_shards(self):
+        expected = self.newest_first(self.posts)
+        response = self.client.get(reverse('posts:index'), {'cursor': ''})
+        first = response.context['page_obj']
+        self.assertEqual(self.page(response), expected[:4])
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': first.next_cursor}
+        )
+        self.assertEqual(self.page(response), expected[4:])
+
+    def test_group_feed_merges_shards(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertEqual(
+            self.page(response), self.newest_first(self.posts[:3])
+        )
+
+    def test_profile_and_post_detail_read_one_shard(self):
+        author = self.authors[SHARD]
+        post = self.posts[1]
+        with CaptureQueriesContext(connections[SHARD]) as shard, \
+                CaptureQueriesContext(connections['default']) as default:
+            response = self.client.get(
+                reverse('posts:post_detail', args=[post.pk])
+            )
+        self.assertEqual(response.context['post'].text, post.text)
+        self.assertEqual(response.context['post'].author, author)
+        self.assertTrue(shard.captured_queries)
+        self.assertFalse([
+            query for query in default.captured_queries
+            if 'posts_post' in query['sql']
+            or 'posts_comment' in query['sql']
+        ])
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username])
+        )
+        self.assertEqual(
+            self.page(response), self.newest_first(self.posts[1::2])
+        )
+
+    def test_unknown_post_not_found(self):
+        for name in ('posts:post_detail', 'posts:post_comments'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=[1001]))
+                self.assertEqual(response.status_code, 404)
+
+    def test_comment_saved_in_post_shard(self):
+        post = self.posts[1]
+        self.client_reader.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'},
+        )
+        comment = Comment.objects.using(SHARD).get(post_id=post.pk)
+        self.assertEqual(comment.author_id, self.reader.pk)
+        self.assertEqual(
+            Post.objects.using(SHARD).get(pk=post.pk).comments_count, 1
+        )
+        response = self.client.get(
+            reverse('posts:post_comments', args=[post.pk])
+        )
+        self.assertContains(response, 'Комментарий')
+
+    def test_follow_feed_merges_shards(self):
+        for author in self.authors.values():
+            Follow.objects.create(user=self.reader, author=author)
+        response = self.client_reader.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            self.page(response), self.newest_first(self.posts)[:4]
+        )
+
+    def test_search_merges_shards(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(len(response.context['page_obj']), 4)
+        response = self.client.get(reverse('posts:search'), {
+            'q': 'пост', 'author': self.authors[SHARD].username,
+            'group': self.group.slug,
+        })
+        self.assertEqual(self.page(response), [self.posts[1].pk])
+
+    def test_repair_counts_posts_of_all_shards(self):
+        UserStats.objects.all().delete()
+        counters.repair()
+        for author in self.authors.values():
+            self.assertEqual(UserStats.of(author).posts_count, 3)
+
+    def test_deleting_author_deletes_posts_in_shard(self):
+        author = User.objects.get(pk=self.authors[SHARD].pk)
+        Comment.objects.create(
+            post=self.posts[0], author=author, text='Комментарий'
+        )
+        author.delete()
+        self.assertFalse(Post.objects.using(SHARD).exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_shard_keeps_foreign_keys_off_after_migrations(self):
+        with connections[SHARD].cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_migrations_allowed_on_shards_only(self):
+        router = AuthorShardRouter()
+        self.assertTrue(router.allow_migrate(SHARD, 'posts'))
+        self.assertIsNone(router.allow_migrate('replica', 'posts'))
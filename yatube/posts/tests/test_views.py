@@ -1,23 +1,28 @@
-import shutil
-import tempfile
+from http import HTTPStatus
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from core.cache_backends.sqlite import SQLiteCache
+from core.testing import TempMediaMixin
+from jobs.worker import Worker
 
-User = get_user_model()
+from .. import feed_cache
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..thumbnails import cached_thumbnail, picture, pregenerate, variants
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostsViewsTests(TestCase):
+class PostsViewsTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -48,12 +53,8 @@ class PostsViewsTests(TestCase):
             image=cls.image,
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='One')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -113,6 +114,54 @@ class PostsViewsTests(TestCase):
         self.assertEqual(post_id, 1)
         self.assertEqual(post_image, PostsViewsTests.post.image)
 
+    def test_post_detail_shows_pregenerated_thumbnail(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': 1})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        self.assertEqual(
+            pregenerate(self.post.image.name), len(variants())
+        )
+        response = self.authorized_client.get(url)
+        for variant in variants():
+            with self.subTest(variant=variant.geometry):
+                thumbnail = cached_thumbnail(self.post.image, variant)
+                self.assertContains(
+                    response, f'{thumbnail.url} {variant.width}w'
+                )
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_picture_reads_all_thumbnails_at_once(self):
+        pregenerate(self.post.image.name)
+        with mock.patch.object(
+            SQLiteCache, '_select', autospec=True,
+            side_effect=SQLiteCache._select,
+        ) as select:
+            found = picture(self.post.image)
+        self.assertEqual(select.call_count, 1)
+        self.assertEqual(len(select.call_args[0][1]), len(variants()))
+        self.assertEqual(
+            found['fallback']['largest'].name,
+            cached_thumbnail(self.post.image, variants()[-1]).name,
+        )
+
+    @override_settings(POST_IMAGE_FORMATS=('PNG', 'JPEG'))
+    def test_post_detail_offers_alternative_format(self):
+        pregenerate(self.post.image.name)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 1})
+        )
+        self.assertContains(response, '<source type="image/png"')
+        self.assertContains(response, 'sizes="(max-width: 992px) 100vw')
+
+    def test_thumbnail_job_refreshes_cached_pages(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertNotContains(response, '<picture>')
+        Worker('test').run_pending()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<picture>')
+
     def test_create_post_edit_show_correct_context(self):
         response = self.author_client.get(reverse(
             'posts:post_edit', kwargs={'post_id': 1})
@@ -144,13 +193,29 @@ class PostsViewsTests(TestCase):
 
     def test_cache(self):
         response1 = self.client.get(reverse('posts:index')).content
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='changed')
         response2 = self.client.get(reverse('posts:index')).content
         self.assertEqual(response1, response2)
         cache.clear()
         response3 = self.client.get(reverse('posts:index')).content
         self.assertNotEqual(response1, response3)
 
+    def test_cache_is_invalidated_on_post_delete(self):
+        response1 = self.client.get(reverse('posts:index')).content
+        self.post.delete()
+        response2 = self.client.get(reverse('posts:index')).content
+        self.assertNotEqual(response1, response2)
+
+    def test_cache_depends_on_page(self):
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'page {i}')
+            for i in range(settings.PAGINATION_NUMBER)
+        ])
+        cache.clear()
+        first = self.client.get(reverse('posts:index')).content
+        second = self.client.get(reverse('posts:index') + '?page=2').content
+        self.assertNotEqual(first, second)
+
     def test_new_user_post_appears_in_the_feed_of_those_who_follow_him(self):
         Follow.objects.create(
             user=self.user,
@@ -171,6 +236,28 @@ class PostsViewsTests(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
 
+    def test_unfollow_removes_author_posts_from_the_feed(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_popular_author_posts_are_merged_on_read(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='popular')
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
     def test_authorized_user_can_follow_other_users(self):
         self.authorized_client.get(
             reverse('posts:profile_follow', kwargs={'username': self.author})
@@ -236,3 +323,248 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     posts_count - settings.PAGINATION_NUMBER
                 )
+
+    def test_cursor_pages_cover_all_records(self):
+        posts_count = Post.objects.count()
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.client.get(url + '?cursor=')
+        first_page = response.context['page_obj']
+        self.assertTrue(first_page.is_cursor)
+        self.assertEqual(len(first_page), settings.PAGINATION_NUMBER)
+        self.assertFalse(first_page.has_previous())
+        response = self.client.get(
+            url + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(
+            len(second_page), posts_count - settings.PAGINATION_NUMBER
+        )
+        self.assertFalse(second_page.has_next())
+        seen = {post.pk for post in first_page} | {
+            post.pk for post in second_page
+        }
+        self.assertEqual(len(seen), posts_count)
+        response = self.client.get(
+            url + f'?cursor={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page],
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.PAGINATION_NUMBER
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FeedFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        cls.groups = []
+        for slug in ('cats', 'dogs'):
+            group = Group.objects.create(title=slug, slug=slug)
+            Post.objects.create(author=author, text=f'Пост {slug}',
+                                group=group)
+            cls.groups.append(group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_with_equal_generations_do_not_share_fragments(self):
+        cache.set_many({
+            feed_cache._key(feed_cache.GENERATION_PREFIX, ('group', slug)): 1
+            for slug in ('cats', 'dogs')
+        }, timeout=None)
+        for group in self.groups:
+            response = self.client.get(
+                reverse('posts:group_list', args=[group.slug])
+            )
+            self.assertContains(response, f'Пост {group.slug}')
+
+    def test_group_slug_change_refreshes_profile_and_old_group(self):
+        url = reverse('posts:profile', args=['auth'])
+        self.client.get(url)
+        old = feed_cache.generations(('group', 'cats'))
+        group = self.groups[0]
+        group.slug = 'kittens'
+        group.save()
+        self.assertNotEqual(feed_cache.generations(('group', 'cats')), old)
+        response = self.client.get(url)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['kittens'])
+        )
+
+
+class QueryCountTests(TestCase):
+    """Число запросов страницы не растёт вместе с числом строк на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Имя', last_name='Фамилия'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test_group', slug='test_slug')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='test_text', group=cls.group
+        )
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def count_queries(self):
+        counts = {}
+        for url in self.urls():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts[url] = len(queries)
+        return counts
+
+    def add_rows(self):
+        for i in range(settings.PAGINATION_NUMBER):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(author=author, text=f'text {i}',
+                                group=self.group)
+            Post.objects.create(author=self.author, text=f'own {i}',
+                                group=self.group)
+            Comment.objects.create(post=self.post, author=author,
+                                   text=f'comment {i}')
+
+    def test_query_count_does_not_depend_on_rows(self):
+        small = self.count_queries()
+        self.add_rows()
+        large = self.count_queries()
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.assertEqual(large[url], small[url])
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='test_text')
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'comment {i}'
+            )
+
+    def test_first_page_is_embedded_and_rest_is_a_fragment(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['comment 0', 'comment 1', 'comment 2'],
+        )
+        self.assertTrue(comments.has_next())
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': comments.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['comment 3', 'comment 4'],
+        )
+        self.assertFalse(response.context['comments'].has_next())
+
+    def test_comments_of_unknown_post_not_found(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SearchViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Котики <b>пушистые</b>',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.other, text='Пушистые собаки')
+        Post.objects.create(author=cls.other, text='Про рыбок')
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return [post.text for post in response.context['page_obj']]
+
+    def test_search_ranks_and_highlights_matches(self):
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'пушистые котики'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.pk for post in page_obj], [self.post.pk])
+        self.assertEqual(
+            page_obj[0].snippet,
+            '<mark>Котики</mark> &lt;b&gt;<mark>пушистые</mark>&lt;/b&gt;',
+        )
+
+    def test_search_filters_by_group_and_author(self):
+        self.assertEqual(len(self.search(q='пушистые')), 2)
+        self.assertEqual(
+            self.search(q='пушистые', group='test_slug'), [self.post.text]
+        )
+        self.assertEqual(
+            self.search(q='пушист*', author='other'), ['Пушистые собаки']
+        )
+
+    def test_index_follows_post_changes(self):
+        post = Post.objects.create(author=self.author, text='Хомяки')
+        post.text = 'Про хомяков'
+        post.save()
+        self.assertEqual(self.search(q='хомяки'), [])
+        self.assertEqual(len(self.search(q='про')), 2)
+        post.delete()
+        self.assertEqual(self.search(q='про'), ['Про рыбок'])
+
+    def test_query_operators_are_treated_as_words(self):
+        self.assertEqual(self.search(q='"( OR котики NEAR'), [])
+
+    @override_settings(PAGINATION_NUMBER=2)
+    def test_api_pages_by_cursor(self):
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'рыбки {i}')
+        response = self.client.get(reverse('posts:search_api'), {'q': 'рыбки'})
+        first = response.json()
+        self.assertEqual(len(first['results']), 2)
+        response = self.client.get(
+            reverse('posts:search_api'),
+            {'q': 'рыбки', 'cursor': first['next']},
+        )
+        second = response.json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        ids = {row['id'] for row in first['results'] + second['results']}
+        self.assertEqual(len(ids), 3)
@@ -0,0 +1,204 @@
+"""Предварительная генерация миниатюр картинок постов.
+
+Для каждой картинки создаются миниатюры всех ширин из
+``POST_IMAGE_WIDTHS`` в каждом формате из ``POST_IMAGE_FORMATS`` (WebP и
+запасной JPEG) — из них шаблон собирает ``<picture>`` с ``srcset``.
+Миниатюры создаёт задача очереди ``posts.generate_thumbnails`` после
+сохранения поста, а шаблоны только читают готовые миниатюры из
+key-value хранилища sorl-thumbnail и никогда не запускают Pillow.
+"""
+import logging
+import time
+from collections import namedtuple
+from itertools import groupby
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+
+from jobs.queue import enqueue
+
+from .metrics import THUMBNAIL_DURATION
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+
+Variant = namedtuple('Variant', 'format width geometry options')
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    def _options(self, source, options):
+        # Те же значения по умолчанию, что и в ThumbnailBackend.get_thumbnail,
+        # чтобы имена миниатюр совпадали с созданными через {% thumbnail %}.
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или ``None``; файлы при этом не открываются."""
+        return self.get_cached_thumbnails(
+            file_, [(geometry_string, options)]
+        )[0]
+
+    def get_cached_thumbnails(self, file_, requests):
+        """Готовые миниатюры (или ``None``) для пар ``(геометрия,
+        опции)``: записи key-value хранилища читаются из кэша одним
+        ``get_many``, база — только для ключей, которых нет в кэше."""
+        source = ImageFile(file_)
+        thumbnails = [
+            ImageFile(self._get_thumbnail_filename(
+                source, geometry_string, self._options(source, options)
+            ), default.storage)
+            for geometry_string, options in requests
+        ]
+        kvstore_cache = getattr(default.kvstore, 'cache', None)
+        if kvstore_cache is None:
+            return [default.kvstore.get(thumbnail) for thumbnail in thumbnails]
+        keys = [add_prefix(thumbnail.key) for thumbnail in thumbnails]
+        found = kvstore_cache.get_many(keys)
+        result = []
+        for key, thumbnail in zip(keys, thumbnails):
+            if key not in found:
+                result.append(default.kvstore.get(thumbnail))
+            elif found[key] in (None, EMPTY_VALUE):
+                result.append(None)
+            else:
+                result.append(deserialize_image_file(found[key]))
+        return result
+
+
+backend = PostThumbnailBackend()
+
+
+def supported_formats():
+    # Pillow без libwebp не умеет сохранять WebP: тогда остаётся только
+    # запасной формат.
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def variants():
+    """Все миниатюры картинки поста: по формату, от узкой к широкой."""
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    return [
+        Variant(
+            image_format,
+            width,
+            f'{width}x{round(width * aspect_height / aspect_width)}',
+            {'crop': 'center', 'upscale': True, 'format': image_format},
+        )
+        for image_format in supported_formats()
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def cached_thumbnail(image, variant):
+    if not image:
+        return None
+    return backend.get_cached_thumbnail(
+        image.name, variant.geometry, **variant.options
+    )
+
+
+def cached_thumbnails(image, all_variants):
+    """Готовые миниатюры (или ``None``) в порядке ``all_variants``:
+    одно чтение кэша на картинку."""
+    if not image:
+        return [None] * len(all_variants)
+    return backend.get_cached_thumbnails(
+        image.name,
+        [(variant.geometry, variant.options) for variant in all_variants],
+    )
+
+
+def picture(image):
+    """Готовые миниатюры для ``<picture>`` или ``None``, пока их нет.
+
+    ``sources`` — ``srcset`` по форматам, ``fallback`` — последний
+    формат из настроек для ``<img>``; ``largest`` — его самая широкая
+    миниатюра.
+    """
+    all_variants = variants()
+    found = zip(all_variants, cached_thumbnails(image, all_variants))
+    sources = []
+    for image_format, group in groupby(found, key=lambda v: v[0].format):
+        ready = [
+            (variant.width, thumbnail) for variant, thumbnail in group
+            if thumbnail is not None
+        ]
+        if ready:
+            sources.append({
+                'type': MIME_TYPES[image_format],
+                'srcset': ', '.join(
+                    f'{thumbnail.url} {width}w' for width, thumbnail in ready
+                ),
+                'largest': ready[-1][1],
+            })
+    if not sources:
+        return None
+    return {'sources': sources[:-1], 'fallback': sources[-1]}
+
+
+def remember_source_size(name, size):
+    """Кладёт известный размер оригинала в key-value хранилище.
+
+    sorl-thumbnail узнаёт размер оригинала из хранилища, а при его
+    отсутствии открывает файл.
+    """
+    source = ImageFile(name, default.storage)
+    if default.kvstore.get(source) is None:
+        source.set_size(size)
+        default.kvstore.set(source)
+
+
+def pregenerate(name, size=None):
+    """Создаёт все миниатюры картинки; возвращает их число.
+
+    ``size`` — сохранённые в посте ширина и высота оригинала.
+    """
+    if size is not None:
+        remember_source_size(name, size)
+    created = 0
+    for variant in variants():
+        started = time.perf_counter()
+        try:
+            backend.get_thumbnail(name, variant.geometry, **variant.options)
+            created += 1
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s', name)
+        THUMBNAIL_DURATION.observe(
+            time.perf_counter() - started, format=variant.format
+        )
+    return created
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр картинки поста в очередь задач."""
+    if post.image:
+        enqueue(
+            'posts.generate_thumbnails',
+            (post.image.name, post.image_width, post.image_height),
+            key=f'thumbnails:{post.image.name}',
+        )
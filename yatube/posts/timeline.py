@@ -0,0 +1,143 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост копируется в ленты подписчиков автора, поэтому ``follow_index``
+читает одну строку индекса ``(user, pub_date, post)`` на каждый пост.
+Посты авторов, у которых больше ``TIMELINE_FANOUT_THRESHOLD`` подписчиков,
+не рассылаются, а подмешиваются в ленту при чтении.
+
+С шардами постов (``posts.sharding``) записи ленты ссылались бы на посты
+из другой базы, поэтому ленты не материализуются: ``feed`` выбирает посты
+авторов из подписок в каждом шарде и сливает их.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from . import sharding
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_popular(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def _push(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if sharding.enabled() or is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _push([
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    ])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if sharding.enabled() or is_popular(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL_SIZE]
+    _push([
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    ])
+
+
+def remove(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebalance(author_id):
+    """Автор перестал быть популярным: рассылаем его посты подписчикам."""
+    if sharding.enabled() or not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).exists():
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def rebuild():
+    """Заново заполняет ленты подписок, например после ``bulk_create``.
+
+    Каждый подписчик получает последние посты непопулярных авторов, как
+    после ``backfill``; возвращает число записей.
+    """
+    TimelineEntry.objects.all().delete()
+    if sharding.enabled():
+        return 0
+    authors = Follow.objects.exclude(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD
+    ).values_list('author_id', flat=True).distinct().order_by('author_id')
+    total = 0
+    for author_id in authors.iterator():
+        posts = list(Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )[:settings.TIMELINE_BACKFILL_SIZE])
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        entries = [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in followers.iterator()
+            for pk, pub_date in posts
+        ]
+        _push(entries)
+        total += len(entries)
+    return total
+
+
+def entries_to_posts(entries):
+    return [entry.post for entry in entries]
+
+
+def feed(user):
+    """Возвращает ленту подписок и параметры её пагинации."""
+    if sharding.enabled():
+        following = list(Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ))
+        return sharding.merged(
+            Post.objects.filter(author_id__in=following)
+            .with_feed_relations()
+        ), {}
+    popular = list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=(
+            settings.TIMELINE_FANOUT_THRESHOLD
+        ),
+    ).values_list('author_id', flat=True))
+    if not popular:
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ).order_by('-pub_date', '-post_id')
+        return entries, {
+            'fields': ('pub_date', 'post_id'),
+            'transform': entries_to_posts,
+        }
+    posts = Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author_id__in=popular)
+    ).select_related('author', 'group').order_by('-pub_date', '-pk')
+    return posts, {}
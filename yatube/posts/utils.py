@@ -1,11 +1,187 @@
-from django.core.paginator import Paginator
+import base64
+import json
+
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from . import sharding
+from .models import Comment
+
+CURSOR_PARAM = 'cursor'
+FORWARD = 'next'
+BACKWARD = 'prev'
+
+
+def encode_cursor(values, direction=FORWARD):
+    payload = json.dumps(
+        {'v': [str(value) for value in values], 'd': direction}
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError):
+        return None, None
+
+
+class CursorPage:
+    """Страница keyset-пагинации: без номера страницы и общего числа."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor,
+                 previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
 
+    def has_next(self):
+        return self.next_cursor is not None
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.PAGINATION_NUMBER)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по набору полей, например ``(pub_date, id)``.
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` каждая страница выбирается условием
+    «строго после курсора» по индексу, поэтому время ответа не зависит
+    от номера страницы.
+    """
+
+    def __init__(self, queryset, per_page, fields=('pub_date', 'id'),
+                 descending=True):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = fields
+        self.descending = descending
+
+    def cursor_for(self, obj, direction):
+        values = [getattr(obj, field) for field in self.fields]
+        return encode_cursor(values, direction)
+
+    def _parse(self, cursor):
+        if not cursor:
+            return None, FORWARD
+        raw_values, direction = decode_cursor(cursor)
+        if (
+            raw_values is None
+            or direction not in (FORWARD, BACKWARD)
+            or len(raw_values) != len(self.fields)
+        ):
+            return None, FORWARD
+        model = self.queryset.model
+        try:
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, raw_values)
+            ]
+        except ValidationError:
+            return None, FORWARD
+        return values, direction
+
+    def _ordering(self, reverse):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [prefix + field for field in self.fields], descending
+
+    def _after(self, values, descending):
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.fields, values):
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def get_page(self, cursor=None):
+        values, direction = self._parse(cursor)
+        reverse = direction == BACKWARD
+        ordering, descending = self._ordering(reverse)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, descending))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        return CursorPage(
+            rows,
+            self,
+            self.cursor_for(rows[-1], FORWARD) if has_next and rows
+            else None,
+            self.cursor_for(rows[0], BACKWARD) if has_previous and rows
+            else None,
+        )
+
+
+def get_page_context(queryset, request, cursor=None,
+                     fields=('pub_date', 'id'), transform=None,
+                     descending=True):
+    """Контекст страницы ленты.
+
+    ``fields`` — поля keyset-курсора и направление сортировки по ним,
+    ``transform`` превращает строки страницы в объекты для шаблона
+    (например, записи ленты в посты).
+    """
+    if cursor is None:
+        cursor = (
+            settings.PAGINATION_MODE == 'cursor'
+            or CURSOR_PARAM in request.GET
+        )
+    if cursor:
+        paginator = CursorPaginator(
+            queryset, settings.PAGINATION_NUMBER, fields=fields,
+            descending=descending,
+        )
+        page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    else:
+        paginator = Paginator(queryset, settings.PAGINATION_NUMBER)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    if transform is not None:
+        page_obj.object_list = transform(page_obj.object_list)
+    params = request.GET.copy()
+    params.pop(CURSOR_PARAM, None)
+    params.pop('page', None)
     return {
         'page_obj': page_obj,
+        # Остальные параметры запроса (например, фильтры поиска)
+        # сохраняются в ссылках пагинатора.
+        'page_query': params.urlencode(),
     }
+
+
+def get_comments_page(post_id, request):
+    """Страница комментариев поста по курсору ``(created, id)``."""
+    paginator = CursorPaginator(
+        sharding.for_post(Comment.objects, post_id).for_post(post_id)
+        .with_author(),
+        settings.COMMENTS_PER_PAGE,
+        fields=('created', 'id'),
+        descending=False,
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
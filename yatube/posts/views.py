@@ -1,33 +1,56 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import condition
 
-from .forms import PostForm, CommentForm
-from .models import Comment, Follow, Group, Post
-from .utils import get_page_context
+from . import feed_cache, search, sharding, timeline
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Follow, Group, Post, UserStats
+from .utils import get_comments_page, get_page_context
 
 User = get_user_model()
 
+conditional_page = condition(
+    etag_func=feed_cache.page_etag,
+    last_modified_func=feed_cache.page_last_modified,
+)
 
+
+@conditional_page
 def index(request):
     context = get_page_context(
-        Post.objects.select_related('author').all(), request
+        sharding.merged(Post.objects.with_feed_relations()), request
     )
+    context.update(feed_cache.feed_cache_context(request, ('index',)))
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(
+        get_page_context(
+            sharding.merged(group.posts.with_feed_relations()), request
+        )
+    )
+    context.update(
+        feed_cache.feed_cache_context(request, ('group', group.slug))
+    )
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    count = author.posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    count = UserStats.of(author).posts_count
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(
@@ -39,14 +62,26 @@ def profile(request, username):
         'count': count,
         'following': following,
     }
-    context.update(get_page_context(author.posts.all(), request))
+    context.update(
+        get_page_context(author.posts.with_feed_relations(), request)
+    )
+    context.update(
+        feed_cache.feed_cache_context(
+            request, ('profile', author.username), ('groups',)
+        )
+    )
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    count = post.author.posts.count()
-    comment = Comment.objects.filter(post=post_id)
+    post = get_object_or_404(
+        sharding.related(
+            sharding.for_post(Post.objects, post_id), 'author__stats', 'group'
+        ),
+        pk=post_id,
+    )
+    count = UserStats.of(post.author).posts_count
     form = CommentForm(request.POST or None)
     if request.method == 'POST':
         return redirect('posts: add_comment')
@@ -54,26 +89,44 @@ def post_detail(request, post_id):
         'post': post,
         'count': count,
         'form': form,
-        'comments': comment,
+        'comments': get_comments_page(post_id, request),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_page
+def post_comments(request, post_id):
+    comments = get_comments_page(post_id, request)
+    # Непустая страница уже доказывает, что пост есть: лишний запрос
+    # нужен только для пустой.
+    if not comments and not sharding.for_post(
+        Post.objects, post_id
+    ).filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             form.instance.author = request.user
-            form.save()
+            with transaction.atomic():
+                form.save()
             return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = get_object_or_404(sharding.for_post(Post.objects, post_id),
+                             pk=post_id)
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post
@@ -89,21 +142,26 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(sharding.for_post(Post.objects, post_id),
+                             pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list, options = timeline.feed(request.user)
     context = {}
-    context.update(get_page_context(post_list, request))
+    context.update(get_page_context(post_list, request, **options))
+    context.update(feed_cache.feed_cache_context(
+        request, ('index',), ('follow', request.user.pk)
+    ))
     return render(request, 'posts/follow.html', context)
 
 
@@ -111,17 +169,67 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', author)
 
 
 @login_required
 def profile_unfollow(request, username):
     user = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=user).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=user).delete()
     return redirect('posts:profile', user)
 
 
+def _search_results(form):
+    return search.search_posts(
+        form.cleaned_data['q'],
+        group=form.cleaned_data['group'],
+        author=form.cleaned_data['author'],
+        date_from=form.cleaned_data['date_from'],
+        date_to=form.cleaned_data['date_to'],
+    )
+
+
+def search_posts(request):
+    form = SearchForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        context.update(get_page_context(
+            _search_results(form), request, cursor=True,
+            fields=('rank', 'post_id'), transform=search.to_posts,
+            descending=False,
+        ))
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    page_obj = get_page_context(
+        _search_results(form), request, cursor=True,
+        fields=('rank', 'post_id'), descending=False,
+    )['page_obj']
+    return JsonResponse({
+        'results': [
+            {
+                'id': row.post_id,
+                'url': reverse('posts:post_detail', args=(row.post_id,)),
+                'author': row.post.author.username,
+                'group': row.post.group.slug if row.post.group else None,
+                'pub_date': row.post.pub_date.isoformat(),
+                'rank': row.rank,
+                'snippet': search.highlight(row.snippet),
+            }
+            for row in page_obj
+        ],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
+
+
 def page_not_found(request, exception):
     return render(
         request, 'posts/404.html', {'path': request.path}, status=404
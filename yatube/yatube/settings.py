@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from datetime import timedelta
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'jobs.apps.JobsConfig',
     'sorl.thumbnail',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -50,11 +52,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,7 +69,8 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Время рендера для RequestTimingMiddleware.
+        'BACKEND': 'core.template_backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,13 +91,44 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite с WAL и BEGIN IMMEDIATE (core.db_backends.sqlite3); PRAGMA
+# можно переопределить в OPTIONS['PRAGMAS'].
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Второе соединение с тем же файлом только для чтения: в режиме WAL
+    # читатели не ждут писателя. Для настоящей реплики — её NAME.
+    'replica': {
+        'ENGINE': 'core.db_backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'PRAGMAS': {'journal_mode': None, 'query_only': 'on'},
+            'WRITE_LOCK': False,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Чтение запросов GET и HEAD идёт в READ_DATABASE (core.routers). После
+# записи cookie READ_REPLICA_STICKY_COOKIE на READ_REPLICA_STICKY_SECONDS
+# секунд возвращает чтение пользователя в основную базу.
+DATABASE_ROUTERS = [
+    'posts.sharding.AuthorShardRouter',
+    'core.routers.ReadReplicaRouter',
+]
+READ_DATABASE = 'replica'
+READ_REPLICA_STICKY_COOKIE = 'db_primary'
+READ_REPLICA_STICKY_SECONDS = 10
+
+# Посты, комментарии и поиск по шардам (posts.sharding): псевдонимы баз,
+# пост автора лежит в POST_SHARDS[author_id % len(POST_SHARDS)]. Пустой
+# список — всё в default. Шардами становятся на пустой таблице постов;
+# базам шардов, кроме default, нужен 'PRAGMAS': {'foreign_keys': 'off'}
+# и migrate --database=<шард>.
+POST_SHARDS = []
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -141,14 +179,102 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGINATION_NUMBER = 10
+COMMENTS_PER_PAGE = 20
+# 'offset' — Paginator с номерами страниц, 'cursor' — keyset по (pub_date, id)
+PAGINATION_MODE = 'offset'
+
+# Посты авторов с большим числом подписчиков не рассылаются по лентам
+# подписок, а подмешиваются при чтении.
+TIMELINE_FANOUT_THRESHOLD = 1000
+TIMELINE_BACKFILL_SIZE = 100
 
 CSRF_FAILURE_VIEW = 'posts.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры картинок постов для srcset (posts.thumbnails): ширины с
+# пропорцией POST_IMAGE_ASPECT в каждом формате; последний формат —
+# запасной для браузеров без WebP. Создаются заранее после сохранения поста.
+POST_IMAGE_WIDTHS = (480, 720, 960)
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+# Очередь задач (jobs): воркер — manage.py run_jobs.
+# Через JOBS_LEASE секунд задачу зависшего воркера заберёт другой.
+JOBS_LEASE = 60 * 5
+JOBS_POLL_INTERVAL = 1
+JOBS_KEEP_DONE = timedelta(days=7)
+JOBS_KEEP_FAILED = timedelta(days=30)
+
+# Фрагменты лент инвалидируются сигналами моделей, таймаут лишь
+# ограничивает время жизни устаревших поколений.
+FEED_CACHE_TIMEOUT = 60 * 5
+# Готовые страницы для анонимных читателей (posts.middleware).
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# RequestTimingMiddleware меряет время базы, кэша и шаблонов каждого
+# запроса для метрик; REQUEST_TIMING_SAMPLE_RATE — доля запросов, которым
+# он добавляет заголовок Server-Timing и строку в лог.
+REQUEST_TIMING_SAMPLE_RATE = 0.1
+REQUEST_LOG_FILE = os.path.join(BASE_DIR, 'requests.log')
+
+# Запросы к базе дольше SLOW_QUERY_THRESHOLD секунд пишутся с планом в
+# SLOW_QUERY_LOG_FILE (core.slow_queries); None — не следить.
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'slow_queries.log')
+
+# Метрики Prometheus (core.metrics): файлы процессов в METRICS_DIR,
+# выдача на /metrics только для адресов из METRICS_ALLOWED_IPS.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_ALLOWED_IPS = ('127.0.0.1',)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {
+            'class': 'logging.FileHandler',
+            'filename': REQUEST_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,
+        },
+        'slow_queries': {
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Тесты работают с кэшем, медиа, логами и метриками во временном
+# каталоге (core.testing.IsolatedFiles), а не с файлами из BASE_DIR.
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Общий для всех WSGI-воркеров кэш в файле SQLite: инвалидация
+# через сигналы видна каждому процессу.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_BYTES': 128 * 1024 * 1024,
+        },
     }
 }